@@ -0,0 +1,296 @@
+"""
+This file implements an on-disk cache for rendered static plots and animation
+frames, so that trajectories which have not changed are not rendered again
+"""
+
+import os
+import hashlib
+import collections
+import numpy as np
+import matplotlib.pylab as pl
+from MotionAnimation.PY import data_types as mtype
+
+# Bump this whenever the rendering changes in a way that invalidates old files
+CACHE_VERSION = 2
+
+def hashTrajectory(tr_obj, hasher=None):
+    """
+    hashTrajectory(tr_obj, hasher)
+    Hash the time points, sample values and plot limits of a trajectory (or
+    of every trajectory in a set). The arrays are fed to the hash function
+    directly, without converting them to strings or lists.
+
+    :tr_obj: Trajectory or TrajectorySet to be hashed
+    :hasher: hashlib object to update. A new blake2b hash is used by default
+    :returns: The hasher, updated with the trajectory data
+    """
+
+    if hasher is None:
+        hasher = hashlib.blake2b(digest_size=20)
+
+    for traj in range(tr_obj.getNTrajectories()):
+        for data in [tr_obj.getTPts(traj)] + list(tr_obj.getSampleValues(traj)):
+            data = np.ascontiguousarray(data)
+            hasher.update(('%s%s' % (data.dtype.str, data.shape)).encode())
+            hasher.update(data)
+
+    # Limits set with setLims are applied when plotting (see enforceLimits)
+    if isinstance(tr_obj, mtype.TrajectorySet):
+        members = tr_obj._tr_set
+    else:
+        members = [tr_obj]
+    for tr in members:
+        hasher.update(repr([getattr(tr, lims, None) for lims in \
+                ('_X_lims', '_Y_lims', '_Z_lims')]).encode())
+
+    return hasher
+
+class RenderCache(object):
+    """
+    Content-addressed cache of rendered plots. Entries are keyed by a hash of
+    the trajectory data along with the container and style parameters, and
+    stored as files (PNG images for static plots, NPY arrays for animation
+    frames) in cache_dir. Once the cache grows beyond max_bytes, the least
+    recently used entries are deleted.
+    """
+
+    STATIC_EXTENSION = '.png'
+    FRAMES_EXTENSION = '.npy'
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        """
+        Class constructor
+        :cache_dir: Directory in which the rendered files are stored. Entries
+            already present in the directory (from earlier runs) are reused
+        :max_bytes: Maximum size of the cache on disk
+        """
+
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Cache statistics
+        self._n_hits      = 0
+        self._n_misses    = 0
+        self._n_evictions = 0
+
+        # Entries from least to most recently used. Access times survive
+        # across runs as file modification times (see _lookup)
+        existing_entries = []
+        for filename in os.listdir(cache_dir):
+            if not filename.endswith((self.STATIC_EXTENSION, self.FRAMES_EXTENSION)):
+                continue
+            file_stat = os.stat(os.path.join(cache_dir, filename))
+            existing_entries.append((file_stat.st_mtime, filename, file_stat.st_size))
+
+        self._entries = collections.OrderedDict()
+        self._n_bytes = 0
+        for _, filename, file_size in sorted(existing_entries):
+            self._entries[filename] = file_size
+            self._n_bytes += file_size
+
+        self._evict()
+
+    def getKey(self, tr_obj, *params, **style):
+        """
+        getKey(self, tr_obj, *params, **style)
+        Get the cache key for rendering tr_obj with the given parameters
+
+        :tr_obj: Trajectory or TrajectorySet to be rendered
+        :*params: Any other (hashable by their repr) rendering parameters
+        :**style: Style parameters passed to the plotting functions
+        :returns: Hex digest identifying the rendered output
+        """
+
+        hasher = hashTrajectory(tr_obj)
+        hasher.update(repr((CACHE_VERSION, type(tr_obj).__name__, params, \
+                sorted(style.items()))).encode())
+        return hasher.hexdigest()
+
+    def _getPath(self, filename):
+        return os.path.join(self._cache_dir, filename)
+
+    def _lookup(self, filename):
+        """
+        Look up an entry, marking it as recently used
+
+        :returns: Path to the cached file, or None if the entry is missing
+        """
+
+        if filename not in self._entries or not os.path.exists(self._getPath(filename)):
+            self._discard(filename)
+            self._n_misses += 1
+            return None
+
+        self._entries.move_to_end(filename)
+        os.utime(self._getPath(filename))
+        self._n_hits += 1
+        return self._getPath(filename)
+
+    def _store(self, filename, temp_path):
+        """
+        Move a freshly rendered file into the cache and evict old entries if
+        the cache has grown too big
+        """
+
+        os.replace(temp_path, self._getPath(filename))
+        self._discard(filename)
+        self._entries[filename] = os.path.getsize(self._getPath(filename))
+        self._n_bytes += self._entries[filename]
+        self._evict()
+        return self._getPath(filename)
+
+    def _discard(self, filename):
+        if filename in self._entries:
+            self._n_bytes -= self._entries.pop(filename)
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+        The most recent entry is always kept.
+        """
+
+        while (self._n_bytes > self._max_bytes) and (len(self._entries) > 1):
+            filename, file_size = self._entries.popitem(last=False)
+            self._n_bytes -= file_size
+            self._n_evictions += 1
+            try:
+                os.remove(self._getPath(filename))
+            except FileNotFoundError:
+                pass
+
+    def _getContainer(self, tr_obj, object_type):
+        return mtype.getFigureHandle(tr_obj.getAxisIdentifier(), object_type)
+
+    def _getFigureParams(self, object_type):
+        """
+        Container class, figure size and dpi that a new container for
+        object_type is drawn with. The key is built from these so that cache
+        hits don't have to set up a figure at all.
+        """
+
+        container_class = mtype.getContainerClass(object_type)
+        return (container_class.__name__, tuple(container_class.FIGURE_SIZE), \
+                pl.rcParams['figure.dpi'])
+
+    def renderStatic(self, tr_obj, object_type=None, dpi=None, **plot_opts):
+        """
+        renderStatic(self, tr_obj, object_type, dpi, **plot_opts)
+        Get a PNG image of the static plot of tr_obj (see plotStaticTR),
+        rendering it only if it is not in the cache already
+
+        :tr_obj: Trajectory or TrajectorySet to be plotted
+        :object_type: The category of graphics object that needs to be drawn
+        :dpi: Resolution of the saved image (figure dpi by default)
+        :**plot_opts: Additional arguments for plotStaticTR
+        :returns: Path to the PNG image in the cache
+        """
+
+        filename = self.getKey(tr_obj, 'static', self._getFigureParams(object_type), \
+                dpi, **plot_opts) + self.STATIC_EXTENSION
+
+        cached_path = self._lookup(filename)
+        if cached_path is None:
+            figure_handle = self._getContainer(tr_obj, object_type)
+            temp_path = self._getPath('.tmp-%d-%s' % (os.getpid(), filename))
+            try:
+                tr_obj.plotStaticTR(figure_handle=figure_handle, show=False, **plot_opts)
+                figure_handle.getFigureWindow().savefig(temp_path, format='png', dpi=dpi)
+                cached_path = self._store(filename, temp_path)
+            finally:
+                self._removeTemp(temp_path)
+                figure_handle.release(close_unpooled=True)
+
+        return cached_path
+
+    def _removeTemp(self, temp_path):
+        """
+        Clean up after a render that did not make it into the cache
+        """
+
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def _writeFrames(self, figure_handle, tr_obj, temp_path):
+        """
+        Render the animation frames of tr_obj into a NPY file at temp_path
+        """
+
+        n_frames  = len(tr_obj.getTPts(0))
+        if n_frames == 0:
+            # No time points, hence no frames (of the size of the figure)
+            width, height = figure_handle.getFigureWindow().canvas.get_width_height(physical=True)
+            with open(temp_path, 'wb') as frames_file:
+                np.save(frames_file, np.empty((0, height, width, 4), dtype=np.uint8))
+            return
+
+        frames    = None
+        for frame_idx, frame in enumerate(figure_handle.renderFrames(tr_obj)):
+            if frames is None:
+                frames = np.lib.format.open_memmap(temp_path, mode='w+', \
+                        dtype=frame.dtype, shape=(n_frames,) + frame.shape)
+            frames[frame_idx] = frame
+
+        frames.flush()
+        del frames
+
+    def renderFrames(self, tr_obj, object_type=None):
+        """
+        renderFrames(self, tr_obj, object_type)
+        Get the frames of the animation of tr_obj (see
+        GraphicsContainer.renderFrames), rendering them only if they are not
+        in the cache already
+
+        :tr_obj: Trajectory or TrajectorySet to be animated
+        :object_type: The category of graphics object that needs to be drawn
+        :returns: Memory-mapped array of RGBA frames with shape (n_frames,
+            height, width, 4)
+        """
+
+        filename = self.getKey(tr_obj, 'frames', self._getFigureParams(object_type)) \
+                + self.FRAMES_EXTENSION
+
+        cached_path = self._lookup(filename)
+        if cached_path is None:
+            figure_handle = self._getContainer(tr_obj, object_type)
+            # Frames are written straight to disk as they are rendered
+            temp_path = self._getPath('.tmp-%d-%s' % (os.getpid(), filename))
+            try:
+                self._writeFrames(figure_handle, tr_obj, temp_path)
+                cached_path = self._store(filename, temp_path)
+            finally:
+                self._removeTemp(temp_path)
+                figure_handle.release(close_unpooled=True)
+
+        return np.load(cached_path, mmap_mode='r')
+
+    def getStats(self):
+        """
+        getStats(self)
+        :returns: Dictionary of cache statistics (hits, misses, evictions,
+            number of entries, size on disk and the hit rate)
+        """
+
+        n_lookups = self._n_hits + self._n_misses
+        return {'hits': self._n_hits,
+                'misses': self._n_misses,
+                'evictions': self._n_evictions,
+                'entries': len(self._entries),
+                'bytes': self._n_bytes,
+                'hit_rate': (self._n_hits / n_lookups) if n_lookups else 0.0}
+
+    def clear(self):
+        """
+        clear(self)
+        Delete all the cached files
+        """
+
+        for filename in list(self._entries):
+            try:
+                os.remove(self._getPath(filename))
+            except FileNotFoundError:
+                pass
+        self._entries.clear()
+        self._n_bytes = 0
@@ -21,6 +21,12 @@ class Trajectory(object):
     OBJ_TYPE_LINE = 'line'
     OBJ_TYPE_DOT  = 'point'
 
+    # Channels that can be derived from the trajectory data (see getDerived)
+    DERIVED_CHANNELS = ('velocity', 'speed', 'acceleration', 'arc_length')
+
+    # Derived channels with a single value per sample, used to color lines
+    COLOR_CHANNELS   = grpx.GraphicsContainer.COLOR_CHANNELS
+
     def __init__(self, t_vals=np.array(()), x_vals=None):
         # Data labels and auxiliary information
         self._AXES_IDENTIFIER = None
@@ -31,6 +37,9 @@ class Trajectory(object):
         self._time = t_vals
         self._X    = self._checkDataSize(x_vals)
 
+        # Cache for derived channels (velocity, speed, etc.)
+        self._derived = {}
+
     def enforceLimits(self):
         if self._X_lims is None:
             return
@@ -90,25 +99,33 @@ class Trajectory(object):
             raise Exception("Data dimensions not matched. Expect TIME data to match sample values in size")
         return data
 
-    def plotTimedTR(self, object_type=None, figure_handle=None):
+    def plotTimedTR(self, object_type=None, figure_handle=None, realtime=False, speed=1.0):
         """
-        plotTimedTR(self, object_type, figure_handle)
+        plotTimedTR(self, object_type, figure_handle, realtime, speed)
         Function is used to animate the trajectories in time
 
         :figure_handle: Handle to a window in which the trajectory should be
             plotted
         :object_type: The category of graphics object that needs to be drawn.
             Current choices are line and point.
+        :realtime: Play back in step with the wall clock, dropping frames if
+            rendering can't keep up
+        :speed: Simulated time per second of wall time for realtime playback
         :returns: TRUE is plot went through successfully, raises appropriate
             exception otherwise
 
         """
 
+        owns_handle   = figure_handle is None
         figure_handle = getFigureHandle(self._AXES_IDENTIFIER, object_type, in_fhandle=figure_handle)
-        figure_handle.animate(self)
+        figure_handle.animate(self, realtime=realtime, speed=speed)
+        if owns_handle:
+            # Nobody else can get hold of a pooled container made here
+            figure_handle.release()
         return(True)
 
-    def plotStaticTR(self, object_type=None, figure_handle=None, show=True, show_start_stop=True):
+    def plotStaticTR(self, object_type=None, figure_handle=None, show=True, show_start_stop=True, \
+            color_by=None):
         """
         plotStaticTR(self, object_type, figure_handle)
         Function is used to plot the trajectory data as a static plot in the
@@ -120,14 +137,21 @@ class Trajectory(object):
             Current choices are line and point.
         :show: Determines whether the figure is displayed at the end of the
             function call or not
+        :color_by: Optional scalar derived channel (one of COLOR_CHANNELS) by
+            which the line is colored (2D trajectories only)
         :returns: TRUE if the plot went through successfully, raises
             appropriate exception otherwise.
 
         """
 
+        _checkColorChannel(color_by)
         list_of_sample_values   = self.getSampleValues()
+        owns_handle   = figure_handle is None
         figure_handle = getFigureHandle(self._AXES_IDENTIFIER, object_type, in_fhandle=figure_handle)
-        figure_handle.plot(*list_of_sample_values)
+        if color_by is None:
+            figure_handle.plot(*list_of_sample_values)
+        else:
+            figure_handle.plotColored(self.getDerived(color_by), *list_of_sample_values)
 
         if show_start_stop:
         # Optional: Can be disabled by passing in appropriate argument
@@ -147,8 +171,32 @@ class Trajectory(object):
         if (show):
             figure_handle.show()
 
+        if owns_handle:
+            # Only the figure window is returned, so a pooled container has to
+            # be handed back here
+            figure_handle.release()
         return(figure_handle.getFigureWindow())
 
+    def refreshStaticTR(self, figure_handle=None, show_start_stop=True):
+        """
+        refreshStaticTR(self, figure_handle, show_start_stop)
+        Static plot of a trajectory that is still growing (through update).
+        The first call plots the trajectory like plotStaticTR. Subsequent
+        calls with the same figure_handle only draw the samples that were
+        added since the previous call, so a refresh costs O(new samples).
+
+        :figure_handle: Graphics container returned by the previous call
+        :show_start_stop: Show the first and the latest point of the
+            trajectory separately
+        :returns: The graphics container, to be passed in for the next refresh.
+            Release it (see GraphicsContainer.release) once the trajectory is
+            done growing, in case it came from a container pool.
+        """
+
+        figure_handle = getFigureHandle(self._AXES_IDENTIFIER, in_fhandle=figure_handle)
+        figure_handle.extendPlot(self, *self.getSampleValues(), show_start_stop=show_start_stop)
+        return(figure_handle)
+
     def plot(self, figure_handle=None, axes_handles=None, show=True):
         """
         Show a vanilla plot with Time on the X-axis and one variable of the
@@ -215,11 +263,109 @@ class Trajectory(object):
         Updated the values already available in the trajectory.
         Takes in a list of lists (The number of lists put in should match the
         class's expectations), for example, 2 for 1D trajectory (time, X).
+        Cached derived channels are extended (not recomputed) the next time
+        they are accessed.
         """
         self._time = np.append(self._time, values[0])
         self._X = np.append(self._X, values[1])
         return
 
+    def getDerived(self, channel, *opts):
+        """
+        getDerived(self, channel, *opts)
+        Get a channel derived from the trajectory data using finite
+        differences over the time points. Channels are computed when they are
+        first asked for and cached. Since update only ever appends samples,
+        only the samples added since the last call are computed afterwards.
+
+        :channel: One of DERIVED_CHANNELS. 'velocity' and 'acceleration' have
+            one row per dimension, 'speed' and 'arc_length' are scalar
+        :*opts: Not used. Here to maintain consistency with the calling
+            syntax for trajectory sets
+        :returns: numpy array with a value for every time point
+        """
+
+        if channel not in Trajectory.DERIVED_CHANNELS:
+            raise ValueError('Invalid derived channel: %s!'% channel)
+
+        n_samples = len(self._time)
+        cached = self._derived.get(channel)
+        if (cached is not None) and (cached.shape[-1] == n_samples):
+            return cached
+
+        n_valid = 0
+        if (cached is not None) and (cached.shape[-1] < n_samples):
+            n_valid = cached.shape[-1]
+
+        first_changed, new_values = self._computeDerived(channel, n_valid)
+        if n_valid > 0:
+            new_values = np.concatenate((cached[..., :first_changed], new_values), axis=-1)
+        self._derived[channel] = new_values
+        return new_values
+
+    def getVelocity(self):
+        return self.getDerived('velocity')
+
+    def getSpeed(self):
+        return self.getDerived('speed')
+
+    def getAcceleration(self):
+        return self.getDerived('acceleration')
+
+    def getArcLength(self):
+        return self.getDerived('arc_length')
+
+    def _computeDerived(self, channel, n_valid):
+        """
+        _computeDerived(self, channel, n_valid)
+        Compute a derived channel for the samples that are not covered by the
+        cached values (plus the ones near the end which depend on the new
+        samples)
+
+        :channel: One of DERIVED_CHANNELS
+        :n_valid: Number of samples for which cached values exist
+        :returns: Index of the first sample that was computed and the values
+            from that sample onwards
+        """
+
+        sample_values = self.getSampleValues()
+        if channel == 'velocity':
+            # Central differences: the previous last sample has changed too
+            first_changed = max(0, n_valid - 1)
+            window_start  = max(0, first_changed - 1)
+            positions = np.vstack([data[window_start:] for data in sample_values])
+            values = _timeDerivative(positions, self._time[window_start:])
+        elif channel == 'acceleration':
+            first_changed = max(0, n_valid - 2)
+            window_start  = max(0, first_changed - 1)
+            velocity = self.getDerived('velocity')
+            values = _timeDerivative(velocity[:, window_start:], self._time[window_start:])
+        elif channel == 'speed':
+            first_changed = max(0, n_valid - 1)
+            window_start  = first_changed
+            values = np.sqrt(np.sum(self.getDerived('velocity')[:, first_changed:]**2, axis=0))
+        else:
+            # Arc length only accumulates, the cached values don't change
+            first_changed = max(0, n_valid - 1)
+            window_start  = first_changed
+            positions = np.vstack([data[first_changed:] for data in sample_values])
+            offset = self._derived['arc_length'][first_changed] if n_valid > 0 else 0.0
+            values = offset + np.concatenate(([0.0], \
+                    np.cumsum(np.sqrt(np.sum(np.diff(positions, axis=1)**2, axis=0)))))[:positions.shape[1]]
+
+        return first_changed, values[..., first_changed-window_start:]
+
+def _timeDerivative(values, t_vals):
+    """
+    Derivative of values (one row per dimension) with respect to time, using
+    second order central differences in the interior and one sided
+    differences at the ends.
+    """
+
+    if len(t_vals) < 2:
+        return np.zeros(np.shape(values))
+    return np.gradient(values, t_vals, axis=-1)
+
 class Trajectory__2D(Trajectory):
     """
     class Trajectory__2D 
@@ -324,6 +470,9 @@ class TrajectorySet(object):
     def getNTrajectories(self):
         return(len(self._tr_set))
 
+    def getAxisIdentifier(self):
+        return(self._AXES_IDENTIFIER)
+
     def getTPts(self, index=0):
         """
         getTPts(self, index)
@@ -351,6 +500,17 @@ class TrajectorySet(object):
 
         return self._tr_set[index].getSampleValues()
 
+    def getDerived(self, channel, index=0):
+        """
+        getDerived(self, channel, index)
+        Function returns a derived channel (see Trajectory.getDerived) for the
+        trajectory specified by index
+        """
+        if (index > len(self._tr_set)):
+            raise Exception("Index access out of the set range")
+
+        return self._tr_set[index].getDerived(channel)
+
     def append(self, tr):
         """
         Append a new trajectory to the list of trajectories stored in the set
@@ -362,7 +522,7 @@ class TrajectorySet(object):
 
         trajectory_axis_identifier = tr.getAxisIdentifier()
         if trajectory_axis_identifier is not None:
-            self._axis_identifier = trajectory_axis_identifier
+            self._AXES_IDENTIFIER = trajectory_axis_identifier
         self._tr_set    += [tr]
 
     def plot(self, figure_handle=None):
@@ -385,40 +545,178 @@ class TrajectorySet(object):
 
         pl.show(figure_handle)
 
-    def plotStaticTR(self, figure_handle=None):
+    def plotStaticTR(self, figure_handle=None, density=False, show=True, color_by=None, \
+            **density_opts):
         """
-        plotStaticTR(self, figure_handle)
+        plotStaticTR(self, figure_handle, density, show, color_by, **density_opts)
         Function for plotting multiple trajectories together
 
         :figure_handle: Handle for the figure window in which the trajectories
             should be plotted
+        :color_by: Optional scalar derived channel by which the lines are
+            colored (see Trajectory.plotStaticTR)
+        :density: If True, the set is drawn as a single density image (see
+            plotDensityTR) instead of one line per trajectory. Additional
+            keyword arguments are passed on to plotDensityTR.
+        :show: Determines whether the figure is displayed at the end of the
+            function call or not
+        :returns: The figure window
         """
 
+        _checkColorChannel(color_by)
+        if density:
+            return self.plotDensityTR(figure_handle=figure_handle, show=show, **density_opts)
+        if density_opts:
+            raise ValueError('Invalid options %s for a line plot, these only apply with density=True!'% \
+                    ', '.join(sorted(density_opts)))
+
         figure_handle_ = getFigureHandle(self._AXES_IDENTIFIER, in_fhandle=figure_handle)
         print(figure_handle_)
 
         for tr in self._tr_set:
-            tr.plotStaticTR(figure_handle=figure_handle_, show=False)
+            tr.plotStaticTR(figure_handle=figure_handle_, show=False, color_by=color_by)
 
-        figure_handle_.show()
+        if show:
+            figure_handle_.show()
 
-    def plotTimedTR(self, figure_handle=None):
+        if figure_handle is None:
+            figure_handle_.release()
+        return(figure_handle_.getFigureWindow())
+
+    def _iterSampleChunks(self, chunk_size):
+        """
+        _iterSampleChunks(self, chunk_size)
+        Go over the set, chunk_size trajectories at a time, concatenating the X
+        and Y samples of all the trajectories in a chunk
+
+        :returns: Generator of (X, Y, lengths) for every chunk, where lengths
+            holds the number of samples of each trajectory in the chunk
+        """
+
+        for chunk_start in range(0, len(self._tr_set), chunk_size):
+            chunk = [tr.getSampleValues() for tr in self._tr_set[chunk_start:chunk_start+chunk_size]]
+            lengths = np.array([len(samples[0]) for samples in chunk])
+            yield np.concatenate([samples[0] for samples in chunk]), \
+                    np.concatenate([samples[1] for samples in chunk]), lengths
+
+    def plotDensityTR(self, figure_handle=None, log_scale=False, segments=False, \
+            bins=None, chunk_size=1000, show=True):
+        """
+        plotDensityTR(self, figure_handle, log_scale, segments, bins)
+        Rasterize all the trajectories in the set into a single 2D histogram
+        image. Much cheaper than drawing every trajectory as a separate line
+        when the set is huge (and a lot more readable too). For 3D
+        trajectories, the X-Y projection is drawn.
+
+        :figure_handle: Handle for the figure window in which the image should
+            be drawn
+        :log_scale: Use a logarithmic color scale for the counts
+        :segments: Rasterize the line segments joining consecutive samples
+            instead of binning the samples alone
+        :bins: (n_x, n_y) Number of bins. Defaults to the size of the axes in
+            pixels, i.e., the figure resolution
+        :chunk_size: Number of trajectories that are accumulated at once
+        :show: Determines whether the figure is displayed at the end of the
+            function call or not
+        :returns: The figure window
         """
-        plotTimedTR(self, figure_handle)
+
+        for tr in self._tr_set:
+            if len(tr.getSampleValues()) < 2:
+                raise ValueError('Invalid trajectory set for a density plot, all trajectories need at least 2 dimensions!')
+
+        owns_handle   = figure_handle is None
+        figure_handle = getFigureHandle(None, in_fhandle=figure_handle)
+        if self.getNTrajectories() == 0:
+            if owns_handle:
+                figure_handle.release()
+            return(figure_handle.getFigureWindow())
+
+        if bins is None:
+            bins = figure_handle.getPixelShape()
+
+        # First pass: Get the extent of the data
+        x_min, y_min = np.inf, np.inf
+        x_max, y_max = -np.inf, -np.inf
+        for x_vals, y_vals, _ in self._iterSampleChunks(chunk_size):
+            if len(x_vals) == 0:
+                continue
+            x_min, x_max = min(x_min, x_vals.min()), max(x_max, x_vals.max())
+            y_min, y_max = min(y_min, y_vals.min()), max(y_max, y_vals.max())
+
+        if not np.isfinite(x_min):
+            if owns_handle:
+                figure_handle.release()
+            return(figure_handle.getFigureWindow())
+
+        # Pad degenerate ranges so that the samples fall in the image
+        if x_max <= x_min:
+            x_min, x_max = x_min - 0.5, x_max + 0.5
+        if y_max <= y_min:
+            y_min, y_max = y_min - 0.5, y_max + 0.5
+
+        # Nudge the upper edge so that the largest samples land in the last bin
+        x_max = x_max + 1e-9 * (x_max - x_min)
+        y_max = y_max + 1e-9 * (y_max - y_min)
+        extent = (x_min, x_max, y_min, y_max)
+
+        # Second pass: Accumulate the samples
+        accumulator = grpx.DensityAccumulator(extent, bins, segments=segments)
+        for x_vals, y_vals, lengths in self._iterSampleChunks(chunk_size):
+            accumulator.add(x_vals, y_vals, lengths)
+
+        figure_handle.showDensity(accumulator.getCounts(), extent, log_scale=log_scale)
+
+        if show:
+            figure_handle.show()
+
+        if owns_handle:
+            figure_handle.release()
+        return(figure_handle.getFigureWindow())
+
+    def plotTimedTR(self, figure_handle=None, realtime=False, speed=1.0):
+        """
+        plotTimedTR(self, figure_handle, realtime, speed)
         Function for plotting multiple animated trajectories that are synchronized
         in time
 
         :figure_handle: Handle for the figure object in which the trajectories
             should be plotted
+        :realtime: Play back in step with the wall clock, dropping frames if
+            rendering can't keep up
+        :speed: Simulated time per second of wall time for realtime playback
         """
 
+        owns_handle   = figure_handle is None
         figure_handle = getFigureHandle(self._AXES_IDENTIFIER, in_fhandle=figure_handle)
-        figure_handle.animate(self)
+        figure_handle.animate(self, realtime=realtime, speed=speed)
+        if owns_handle:
+            figure_handle.release()
+
+def _checkColorChannel(color_by):
+    if (color_by is not None) and (color_by not in Trajectory.COLOR_CHANNELS):
+        raise ValueError('Invalid color channel: %s, expected one of %s!'% \
+                (color_by, ', '.join(Trajectory.COLOR_CHANNELS)))
+
+def getContainerClass(obj_type=None):
+    """
+    getContainerClass(obj_type)
+    :obj_type: Which plot category is needed - Currently support line and point
+    :returns: The graphics container class used for drawing obj_type
+    """
+
+    if (obj_type is None) or (obj_type == Trajectory.OBJ_TYPE_LINE):
+        return grpx.LineContainer
+    elif (obj_type == Trajectory.OBJ_TYPE_DOT):
+        return grpx.PointContainer
+    raise ValueError('Invalid object type: %s for creating graphics container!'% obj_type)
 
 def getFigureHandle(axes_identifier, obj_type=None, in_fhandle=None):
     """
     Creates a figure handle object if nothing is provided or returns the same
     handle. Helpful when multiple trajectories have to be plotted together.
+    If a container pool has been installed (graphics.setDefaultPool), new
+    containers are drawn from the pool instead of being created from scratch.
 
     :obj_type: Which plot category is needed - Currently support line and point
     :in_f_handle: input figure handle
@@ -428,15 +726,72 @@ def getFigureHandle(axes_identifier, obj_type=None, in_fhandle=None):
     """
 
     if in_fhandle is None:
-        if (obj_type is None) or (obj_type == Trajectory.OBJ_TYPE_LINE):
-            in_fhandle = grpx.LineContainer(axes_identifier)
-        elif (obj_type == Trajectory.OBJ_TYPE_DOT):
-            in_fhandle = grpx.PointContainer(axes_identifier)
+        container_class = getContainerClass(obj_type)
+        pool = grpx.getDefaultPool()
+        if pool is None:
+            in_fhandle = container_class(axes_identifier)
         else:
-            raise ValueError('Invalid object type: %s for creating graphics container!'% obj_type)
+            in_fhandle = pool.acquire(container_class, axes_identifier)
 
     return in_fhandle
 
+def plotTimedGrid(tr_objs, n_cols=None, object_type=None, realtime=False, speed=1.0):
+    """
+    plotTimedGrid(tr_objs, n_cols, object_type, realtime, speed)
+    Animate several trajectories (or trajectory sets) side by side in a grid
+    of subplots, synchronized in time and driven by a single timer
+
+    :tr_objs: List of Trajectory/TrajectorySet objects to compare
+    :n_cols: Number of columns in the grid (square-ish grid by default)
+    :object_type: The category of graphics object that needs to be drawn.
+        Current choices are line and point.
+    :realtime: Play back in step with the wall clock, dropping frames if
+        rendering can't keep up
+    :speed: Simulated time per second of wall time for realtime playback
+    :returns: The grid container
+    """
+
+    container_class = getContainerClass(object_type)
+    if n_cols is None:
+        n_cols = int(np.ceil(np.sqrt(len(tr_objs))))
+    n_rows = int(np.ceil(len(tr_objs) / n_cols))
+
+    axes_identifiers = set(tr_obj.getAxisIdentifier() for tr_obj in tr_objs)
+    axes_projection  = '3d' if ('3d' in axes_identifiers) else None
+
+    grid = grpx.GridContainer(n_rows, n_cols, container_class, axes_projection)
+    grid.animate(tr_objs, realtime=realtime, speed=speed)
+    return grid
+
+def getColumnarSet(t_vals, values):
+    """
+    getColumnarSet(t_vals, values)
+    Build a TrajectorySet from a single block of samples. The trajectories in
+    the set are views into the block, so no data is copied.
+
+    :t_vals: Time points shared by all the trajectories (n_pts,), or one row
+        of time points per trajectory (n_trajectories, n_pts)
+    :values: Sample values of shape (n_trajectories, n_dims, n_pts)
+    :returns: TrajectorySet holding n_trajectories trajectories of the class
+        returned by getTRClass(n_dims)
+    """
+
+    values = np.asarray(values)
+    t_vals = np.asarray(t_vals)
+    if values.ndim != 3:
+        raise ValueError('Expected sample values of shape (n_trajectories, n_dims, n_pts)!')
+
+    n_trajectories, n_dims, n_pts = values.shape
+    if t_vals.shape not in ((n_pts,), (n_trajectories, n_pts)):
+        raise Exception("Data dimensions not matched. Expect TIME data to match sample values in size")
+
+    tr_class = getTRClass(n_dims)
+    tr_set   = TrajectorySet()
+    for traj in range(n_trajectories):
+        tr_time = t_vals if (t_vals.ndim == 1) else t_vals[traj]
+        tr_set.append(tr_class(tr_time, *values[traj]))
+    return tr_set
+
 def getTRClass(n_dims):
     """
     getTRClass(n_dims)
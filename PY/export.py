@@ -0,0 +1,121 @@
+"""
+This file implements batch export of static trajectory plots to image files,
+rendered headlessly across a pool of worker processes
+"""
+
+import os
+import concurrent.futures
+import matplotlib.pylab as pl
+from MotionAnimation.PY import graphics as grpx
+from MotionAnimation.PY import data_types as mtype
+
+# Figures kept alive by every worker (one for each kind of axes in use)
+WORKER_POOL_SIZE = 2
+
+def _initWorker():
+    """
+    Set up a worker process for rendering: no windows, and a container pool
+    so that the figure is reused from one plot to the next
+    """
+
+    pl.switch_backend('Agg')
+    grpx.setDefaultPool(grpx.ContainerPool(max_figures=WORKER_POOL_SIZE))
+
+def _exportStatic(tr_obj, out_path, object_type, dpi, plot_opts):
+    """
+    Render the static plot of a single trajectory (or set) to out_path
+    """
+
+    figure_handle = mtype.getFigureHandle(tr_obj.getAxisIdentifier(), object_type)
+    try:
+        tr_obj.plotStaticTR(figure_handle=figure_handle, show=False, **plot_opts)
+        figure_handle.getFigureWindow().savefig(out_path, dpi=dpi)
+    finally:
+        figure_handle.release(close_unpooled=True)
+    return out_path
+
+def exportStaticBatch(tr_objs, out_paths, n_workers=None, object_type=None, dpi=None, \
+        max_in_flight=None, progress=None, **plot_opts):
+    """
+    exportStaticBatch(tr_objs, out_paths, n_workers, object_type, dpi,
+        max_in_flight, progress, **plot_opts)
+    Save the static plots (see plotStaticTR) of a lot of trajectories to
+    image files, spreading the work over a pool of processes. Every worker
+    renders without a display and reuses its figure from plot to plot.
+
+    :tr_objs: Iterable of Trajectory/TrajectorySet objects. These are sent to
+        the workers, so SharedTrajectorySet objects are best for large sets
+        (only their shared memory handle is sent).
+    :out_paths: Iterable of output file names, one for every trajectory. The
+        image format is picked from the extension.
+    :n_workers: Number of worker processes (number of CPUs by default). With
+        n_workers=1, everything is rendered in this process, still without
+        creating any windows.
+    :object_type: The category of graphics object that needs to be drawn
+    :dpi: Resolution of the saved images (figure dpi by default)
+    :max_in_flight: Maximum number of plots submitted to the workers but not
+        yet finished (2 per worker by default). This bounds the memory used
+        for trajectories waiting to be rendered.
+    :progress: Optional callback, called as progress(n_done, n_total) after
+        every finished plot (n_total is None if the inputs have no length)
+    :**plot_opts: Additional arguments for plotStaticTR
+    :returns: List of the output paths, in the order of the inputs
+    """
+
+    try:
+        n_total = len(tr_objs)
+    except TypeError:
+        n_total = None
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if max_in_flight is None:
+        max_in_flight = 2 * n_workers
+
+    exported_paths = []
+    n_done = 0
+
+    if n_workers <= 1:
+        # Rendered in this process, which may be using a GUI backend. The
+        # figures are drawn with Agg all the same (see ContainerPool).
+        previous_pool = grpx.setDefaultPool(grpx.ContainerPool(max_figures=WORKER_POOL_SIZE, \
+                headless=True))
+        try:
+            for tr_obj, out_path in zip(tr_objs, out_paths):
+                exported_paths.append(_exportStatic(tr_obj, out_path, object_type, dpi, plot_opts))
+                n_done += 1
+                if progress is not None:
+                    progress(n_done, n_total)
+        finally:
+            grpx.getDefaultPool().clear()
+            grpx.setDefaultPool(previous_pool)
+        return exported_paths
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers, initializer=_initWorker) as executor:
+        in_flight = {}
+        for job_idx, (tr_obj, out_path) in enumerate(zip(tr_objs, out_paths)):
+            exported_paths.append(None)
+            if len(in_flight) >= max_in_flight:
+                n_done += _collectFinished(in_flight, exported_paths, n_done, n_total, progress)
+            in_flight[executor.submit(_exportStatic, tr_obj, out_path, object_type, dpi, plot_opts)] = job_idx
+
+        while in_flight:
+            n_done += _collectFinished(in_flight, exported_paths, n_done, n_total, progress)
+
+    return exported_paths
+
+def _collectFinished(in_flight, exported_paths, n_done, n_total, progress):
+    """
+    Wait for at least one of the submitted plots to finish and record the
+    finished ones
+
+    :returns: The number of plots that finished
+    """
+
+    finished, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+    for future in finished:
+        exported_paths[in_flight.pop(future)] = future.result()
+        n_done += 1
+        if progress is not None:
+            progress(n_done, n_total)
+    return len(finished)
@@ -1,6 +1,14 @@
+import sys
+import time
 import matplotlib.pylab as pl
 import matplotlib.cm as colormap
 import matplotlib.animation as animation
+import matplotlib.colors as colors
+import matplotlib.collections as collections
+import matplotlib.ticker as ticker
+import matplotlib.figure as mfigure
+from matplotlib import _pylab_helpers
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
 
 from mpl_toolkits.mplot3d import Axes3D
@@ -17,7 +25,7 @@ pl.rc('xtick', labelsize=MEDIUM_SIZE)    # fontsize of the tick labels
 pl.rc('ytick', labelsize=MEDIUM_SIZE)    # fontsize of the tick labels
 pl.rc('legend', fontsize=SMALL_SIZE)    # legend fontsize
 
-def cleanAxes(ax_obj):
+def cleanAxes(ax_obj, layout=True):
     ax_obj.spines['top'].set_visible(False)
     ax_obj.spines['right'].set_visible(False)
     ax_obj.spines['bottom'].set_linewidth(AXES_LINE_THICCCK)
@@ -27,7 +35,243 @@ def cleanAxes(ax_obj):
     ax_obj.xaxis.set_tick_params(width=AXES_LINE_THICCCK)
     ax_obj.yaxis.set_tick_params(width=AXES_LINE_THICCCK)
     ax_obj.grid(False)
-    pl.tight_layout()
+    if layout:
+        pl.tight_layout()
+
+# Container pool that getFigureHandle should draw from (None disables pooling)
+_DEFAULT_POOL = None
+
+def setDefaultPool(pool):
+    """
+    setDefaultPool(pool)
+    Install a ContainerPool from which new graphics containers are drawn when
+    no figure handle is supplied. Passing None switches pooling off again.
+
+    :pool: ContainerPool instance (or None)
+    :returns: The pool that was previously installed
+    """
+
+    global _DEFAULT_POOL
+    previous_pool = _DEFAULT_POOL
+    _DEFAULT_POOL = pool
+    return previous_pool
+
+def getDefaultPool():
+    return _DEFAULT_POOL
+
+class DensityAccumulator(object):
+    """
+    Accumulates 2D samples (or line segments joining consecutive samples) into
+    a histogram image. Samples are added in chunks, so the cost is linear in
+    the number of samples and memory only depends on the chunk and image size.
+    """
+
+    def __init__(self, extent, shape, segments=False):
+        """
+        Class constructor
+        :extent: (x_min, x_max, y_min, y_max) covered by the image
+        :shape: (n_x, n_y) Number of bins along X and Y
+        :segments: If True, rasterize line segments between consecutive
+            samples of a trajectory instead of just binning the samples
+        """
+
+        self._extent    = extent
+        self._shape     = (int(shape[0]), int(shape[1]))
+        self._segments  = segments
+        self._counts    = np.zeros(self._shape[0] * self._shape[1])
+        self._n_samples = 0
+
+    def _toPixels(self, x_vals, y_vals):
+        """
+        Convert data coordinates to (fractional) pixel coordinates
+        """
+
+        x_min, x_max, y_min, y_max = self._extent
+        x_scale = self._shape[0] / max(x_max - x_min, np.finfo(float).tiny)
+        y_scale = self._shape[1] / max(y_max - y_min, np.finfo(float).tiny)
+        return (x_vals - x_min) * x_scale, (y_vals - y_min) * y_scale
+
+    def add(self, x_vals, y_vals, lengths=None):
+        """
+        add(self, x_vals, y_vals, lengths)
+        Add a chunk of samples to the histogram
+
+        :x_vals: X coordinates of all the samples in the chunk (concatenated
+            over trajectories)
+        :y_vals: Y coordinates of all the samples in the chunk
+        :lengths: Number of samples contributed by each trajectory. Only
+            needed for segments, so that we don't join separate trajectories
+        """
+
+        px, py = self._toPixels(np.asarray(x_vals, dtype=float), \
+                np.asarray(y_vals, dtype=float))
+        self._n_samples += len(px)
+
+        if self._segments and len(px) > 1:
+            # Segment k joins sample k and k+1, except for the last sample of
+            # every trajectory
+            valid = np.ones(len(px) - 1, dtype=bool)
+            if lengths is not None:
+                trajectory_ends = np.cumsum(lengths)[:-1] - 1
+                valid[trajectory_ends[trajectory_ends < len(valid)]] = False
+
+            x0, y0 = px[:-1][valid], py[:-1][valid]
+            dx, dy = px[1:][valid] - x0, py[1:][valid] - y0
+
+            # Sample each segment once per pixel that it crosses (at least
+            # once) so that long and short segments are weighted alike
+            n_steps = np.maximum(1, np.ceil(np.maximum(np.abs(dx), np.abs(dy)))).astype(int)
+            n_steps = np.minimum(n_steps, max(self._shape))
+            seg_idx = np.repeat(np.arange(len(n_steps)), n_steps)
+            offsets = np.arange(len(seg_idx)) - np.repeat(np.cumsum(n_steps) - n_steps, n_steps)
+            frac    = offsets / n_steps[seg_idx]
+
+            px = x0[seg_idx] + frac * dx[seg_idx]
+            py = y0[seg_idx] + frac * dy[seg_idx]
+
+        ix = np.floor(px).astype(int)
+        iy = np.floor(py).astype(int)
+        inside = (ix >= 0) & (ix < self._shape[0]) & (iy >= 0) & (iy < self._shape[1])
+        flat_idx = ix[inside] * self._shape[1] + iy[inside]
+        self._counts += np.bincount(flat_idx, minlength=len(self._counts))
+
+    def getCounts(self):
+        """
+        :returns: Histogram of shape (n_x, n_y)
+        """
+
+        return self._counts.reshape(self._shape)
+
+    def getNSamples(self):
+        return(self._n_samples)
+
+def _ownedBytes(data):
+    """
+    Number of bytes held by data. Numpy views do not own their memory and
+    are not counted. Lists are counted as lists of Python floats.
+    """
+
+    if isinstance(data, np.ndarray):
+        return data.nbytes if (data.base is None) else 0
+    if isinstance(data, (list, tuple)):
+        return sys.getsizeof(data) + sum(sys.getsizeof(value) for value in data)
+    return 0
+
+def _artistBytes(artist):
+    """
+    Rough estimate of the memory used by an artist for storing its data
+    """
+
+    if hasattr(artist, 'get_xydata'):
+        return artist.get_xydata().nbytes
+    if isinstance(artist, collections.LineCollection):
+        n_bytes = sum(path.vertices.nbytes for path in artist.get_paths())
+        if artist.get_array() is not None:
+            n_bytes += artist.get_array().nbytes
+        return n_bytes
+    return 0
+
+def _newHeadlessFigure(figsize):
+    """
+    _newHeadlessFigure(figsize)
+    Create a figure that is always drawn with Agg, whatever backend pyplot is
+    using, so no window is ever created for it. The figure is still handed to
+    pyplot, so that pylab calls (and pl.close) work on it as usual.
+
+    :figsize: Size of the figure in inches
+    :returns: The figure
+    """
+
+    figure = mfigure.Figure(figsize=figsize)
+    number = max(pl.get_fignums(), default=0) + 1
+    _pylab_helpers.Gcf._set_new_active_manager(FigureCanvasAgg.new_manager(figure, number))
+    return figure
+
+class PlaybackClock(object):
+    """
+    Drives an animation by the wall clock instead of stepping through every
+    frame. Each time the animation asks for a frame, the clock works out the
+    simulated time (wall time elapsed, scaled by the speed multiplier) and
+    hands out the last frame at or before it. If rendering falls behind, the
+    frames in between are dropped.
+    """
+
+    def __init__(self, frame_times, speed=1.0):
+        """
+        Class constructor
+        :frame_times: Simulated time of every frame (increasing)
+        :speed: Simulated time that elapses per second of wall time
+        """
+
+        if speed <= 0:
+            raise ValueError('Playback speed has to be positive!')
+
+        self._frame_times   = np.asarray(frame_times)
+        self._speed         = speed
+        self._wall_start    = None
+        self._wall_time     = 0.0
+        self._n_shown       = 0
+        self._n_dropped     = 0
+        self._n_ticks       = 0
+        self._last_step     = -1
+
+    def __iter__(self):
+        # Every pass over the clock (e.g. a replay, or saving the animation)
+        # starts over from the first frame
+        self._wall_start    = None
+        self._wall_time     = 0.0
+        self._n_shown       = 0
+        self._n_dropped     = 0
+        self._n_ticks       = 0
+        self._last_step     = -1
+
+        n_frames = len(self._frame_times)
+        while self._last_step < n_frames - 1:
+            now = time.perf_counter()
+            if self._wall_start is None:
+                self._wall_start = now
+            self._wall_time = now - self._wall_start
+            self._n_ticks  += 1
+
+            sim_time = self._frame_times[0] + self._wall_time * self._speed
+            step = int(np.searchsorted(self._frame_times, sim_time, side='right')) - 1
+            step = min(max(step, 0), n_frames - 1)
+            if step > self._last_step:
+                # Ahead of the clock, frames are never skipped backwards
+                self._n_dropped += step - self._last_step - 1
+                self._n_shown   += 1
+                self._last_step  = step
+            yield self._last_step
+
+    def getStats(self):
+        """
+        getStats(self)
+        :returns: Dictionary with the number of frames shown and dropped, the
+            number of timer ticks, the achieved frame rate (frames shown per
+            second of wall time), and the simulated and wall time elapsed
+        """
+
+        sim_time = 0.0
+        if self._last_step >= 0:
+            sim_time = self._frame_times[self._last_step] - self._frame_times[0]
+        return {'frames_shown': self._n_shown,
+                'frames_dropped': self._n_dropped,
+                'ticks': self._n_ticks,
+                'fps': (self._n_shown / self._wall_time) if self._wall_time > 0 else 0.0,
+                'sim_time': sim_time,
+                'wall_time': self._wall_time,
+                'speed': self._speed}
+
+def _getAnimationFrames(frame_times, realtime, speed):
+    """
+    Frames for FuncAnimation: every frame in order, or a PlaybackClock
+    """
+
+    if not realtime:
+        return np.arange(0, len(frame_times)), None
+
+    clock = PlaybackClock(frame_times, speed)
+    return clock, clock
 
 class GraphicsContainer(object):
     """
@@ -36,21 +280,45 @@ class GraphicsContainer(object):
     """
 
     TEXT_FONT_SIZE      = 20
+    FIGURE_SIZE         = (4, 4)
+
+    # Derived channels of a trajectory (see Trajectory.getDerived) that have a
+    # single value per sample, and can hence be used to color lines
+    COLOR_CHANNELS      = ('speed', 'arc_length')
+
+    # Ways of cutting down the history when the memory budget is exceeded
+    HISTORY_DECIMATE    = 'decimate'
+    HISTORY_WINDOW      = 'window'
 
-    def __init__(self, axes_projection=None):
+    # Memory used by a line artist for every point it shows (X and Y values
+    # as doubles)
+    BYTES_PER_HISTORY_POINT = 16
+
+    # Same for a line colored by a channel: the segment ending at the point
+    # (two X-Y pairs), its color value and the mask hiding it until it is due
+    BYTES_PER_COLORED_POINT = 41
+
+    def __init__(self, axes_projection=None, figure=None, axes=None):
         """
         Class constructor
         :axes_projection: In case a 3D plot is required, axes can be set up for
             it by passing the argument '3d' as axes_projection
+        :figure: Existing figure to draw in (a new one is created by default)
+        :axes: Existing axes (in figure) to draw in
         """
 
         # Before plotting anything, update the appropriate font sizes. This
         # should probably be done in the __init__ file: TODO
-        pl.rcParams.update({'font.size':GraphicsContainer.TEXT_FONT_SIZE})
+        if pl.rcParams['font.size'] != GraphicsContainer.TEXT_FONT_SIZE:
+            pl.rcParams.update({'font.size':GraphicsContainer.TEXT_FONT_SIZE})
 
         # By default, we have 2D axes.
-        self._figure    = pl.figure(figsize=(4,4))
-        self._axes      = pl.axes(projection=axes_projection)
+        if figure is None:
+            self._figure    = pl.figure(figsize=self.FIGURE_SIZE)
+            self._axes      = pl.axes(projection=axes_projection)
+        else:
+            self._figure    = figure
+            self._axes      = axes
         self._is_3d     = (axes_projection == '3d')
         self._x_label   = 'X Position (m)'
         self._y_label   = 'Y Position (m)'
@@ -68,10 +336,138 @@ class GraphicsContainer(object):
         self._tpts      = []
         self._t_elapsed = []
         self._ANIMATION_INTERVAL = 25   # Frame rate for animation
+        self._playback_clock     = None
+
+        # Optional table of sample indices (trajectories x frames) to be shown
+        # in every frame. Used when several containers share one clock.
+        self._frame_table = None
+
+        # Derived channel (see Trajectory.getDerived) used for coloring lines,
+        # and the color scale shared by all the lines in the container
+        self._color_channel = None
+        self._color_cmap    = 'viridis'
+        self._color_data    = None
+        self._color_norm    = None
+
+        # Memory budget for animations. When exceeded, only every
+        # _history_stride'th point of the history is shown, or only a trail of
+        # the last _trail_window points.
+        self._memory_budget  = None
+        self._budget_policy  = GraphicsContainer.HISTORY_DECIMATE
+        self._history_stride = 1
+        self._trail_window   = None
 
         # Storage for all the line plots
         self._track     = []
 
+        # State of trajectories drawn incrementally (see extendPlot) and the
+        # saved axes background that new samples are drawn on top of
+        self._increments  = {}
+        self._background  = None
+        self._view_limits = None
+        self._draw_cid    = None
+
+        # Axes styling is done once per axes and the layout is only recomputed
+        # when the figure size changes (see _applyLayout)
+        self._axes_ready  = False
+        self._layout_size = None
+
+        # Pool that this container has been checked out from (if any)
+        self._pool      = None
+
+    def _prepareAxes(self):
+        """
+        _prepareAxes(self)
+        Style the axes and set up the labels. This only needs to happen once
+        for every set of axes, no matter how many times we plot into it.
+        """
+
+        if self._axes_ready:
+            return
+
+        self._axes.set_xlabel(self._x_label)
+        self._axes.set_ylabel(self._y_label)
+        if (self._is_3d):
+            self._axes.set_zlabel(self._z_label)
+        cleanAxes(self._axes, layout=False)
+        self._axes_ready = True
+
+    def _applyLayout(self):
+        """
+        _applyLayout(self)
+        tight_layout is expensive. Since the labels and styling do not change
+        between plots, the layout is only recomputed if the figure has been
+        resized since the last time.
+        """
+
+        figure_size = tuple(self._figure.get_size_inches())
+        if figure_size == self._layout_size:
+            return
+
+        self._figure.tight_layout()
+        self._layout_size = figure_size
+
+    def reset(self):
+        """
+        reset(self)
+        Remove all the data that has been drawn in this container so that the
+        figure and axes can be reused for a new plot. Axes styling and layout
+        are retained, ticks go back to the defaults.
+        """
+
+        for artist in list(self._axes.lines) + list(self._axes.collections) \
+                + list(self._axes.images) + list(self._axes.texts) \
+                + list(self._axes.patches):
+            artist.remove()
+
+        # show fixes the tick positions, which must not carry over to the next
+        # plot drawn in this container
+        axes_list = [self._axes.xaxis, self._axes.yaxis]
+        if self._is_3d:
+            axes_list.append(self._axes.zaxis)
+        for axis in axes_list:
+            axis.set_major_locator(ticker.AutoLocator())
+            axis.set_major_formatter(ticker.ScalarFormatter())
+
+        self._tr_obj    = []
+        self._past_data = []
+        self._anim_data = []
+        self._tpts      = []
+        self._t_elapsed = []
+        self._track     = []
+        self._increments = {}
+        self._background = None
+        self._color_norm = None
+
+        # Limits might have been frozen by a previous plot (enforceLimits)
+        self._axes.relim()
+        self._axes.set_autoscale_on(True)
+
+        # Bring the figure and axes back into focus for pylab calls
+        pl.figure(self._figure.number)
+        pl.sca(self._axes)
+
+    def release(self, close_unpooled=False):
+        """
+        release(self, close_unpooled)
+        Hand the container back to the pool it was acquired from. Containers
+        that are not pooled are left untouched, unless close_unpooled is set,
+        in which case their figure is closed.
+        """
+
+        if self._pool is not None:
+            self._pool.release(self)
+        elif close_unpooled:
+            self.close()
+
+    def close(self):
+        """
+        close(self)
+        Close the underlying figure window
+        """
+
+        pl.close(self._figure)
+
     def _initAnimationFrame(self):
         """
         _initAnimationFrame(self)
@@ -115,6 +511,21 @@ class GraphicsContainer(object):
         for traj in range(n_trajectories):
             self._track[traj] = None
 
+    def _getFrameIndex(self, idx, step):
+        """
+        _getFrameIndex(self, idx, step)
+        Index of the first sample of trajectory idx that is not shown at
+        animation frame 'step'. By default, the time points of the first
+        trajectory serve as the reference time for the frames.
+
+        :idx: Index of the trajectory
+        :step: The index of the step or frame at which the system is
+        """
+
+        if self._frame_table is not None:
+            return int(self._frame_table[idx, step])
+        return np.searchsorted(self._tpts[idx], self._tpts[0][step])
+
     def _nextAnimationFrame(self):
         """
         Default implementation, not to be used.
@@ -124,15 +535,19 @@ class GraphicsContainer(object):
 
         return None
 
-    def animate(self, tr_obj):
+    def animate(self, tr_obj, realtime=False, speed=1.0):
         """
-        animate(self, tr_obj)
+        animate(self, tr_obj, realtime, speed)
         Function that plots time-value data as animations in 1, 2 or 3
         dimensions.
 
         :tr_obj: The trajectory object that has to be animated. This can be a
             single 1, 2, or 3 dimensional trajectory or a collection of several
             of these in a TrajectorySet container
+        :realtime: If True, playback follows the wall clock (see
+            PlaybackClock), dropping frames whenever rendering falls behind.
+            Otherwise every frame is shown, one per _ANIMATION_INTERVAL.
+        :speed: Simulated time per second of wall time, for realtime playback
         """
 
         # FuncAnimation is the animation type where a function is repeatedly
@@ -142,9 +557,47 @@ class GraphicsContainer(object):
         # 2. ArtistAnimation (Entire animation is recorded in the form of
         #   Artists already and is just replayed)
 
+        n_frames = self._setupAnimation(tr_obj)
+        frames, self._playback_clock = _getAnimationFrames(self._tpts[0], realtime, speed)
+        anim_opts = {}
+        if self._playback_clock is not None:
+            # The clock is a generator, so FuncAnimation can't tell how many
+            # frames it will produce
+            anim_opts = {'save_count': n_frames, 'cache_frame_data': False}
+
+        # TODO: Setting blit to True causes the initialization function to be
+        # called twice instead of just one time, strange. Setting it to false,
+        # however, stops all plotting.
+        anim = animation.FuncAnimation(self._figure, self._nextAnimationFrame, frames, \
+                init_func=self._initAnimationFrame, interval=self._ANIMATION_INTERVAL, blit=True, \
+                repeat=False, **anim_opts)
+
+        pl.show()
+
+    def getPlaybackStats(self):
+        """
+        getPlaybackStats(self)
+        :returns: Statistics of the last realtime animation (see
+            PlaybackClock.getStats), or None if it wasn't played in realtime
+        """
+
+        if self._playback_clock is None:
+            return None
+        return self._playback_clock.getStats()
+
+    def _setupAnimation(self, tr_obj):
+        """
+        _setupAnimation(self, tr_obj)
+        Set up the animation data and the tracks for animating tr_obj
+
+        :tr_obj: Trajectory or TrajectorySet to be animated
+        :returns: The number of frames in the animation
+        """
+
         n_trajectories  = tr_obj.getNTrajectories()
 
         self._tpts      = [tr_obj.getTPts(traj) for traj in range(n_trajectories)]
+        self._frame_table = None
 
         # t_elapsed stores the index of the last time point that elapsed for
         # the animation frame
@@ -168,17 +621,200 @@ class GraphicsContainer(object):
 
         # Set up the line plots for animation
         # print("Animating", n_trajectories, "trajectories, and", n_frames, "frames.")
+        self._color_data = None
+        if self._color_channel is not None:
+            self._color_data = [tr_obj.getDerived(self._color_channel, traj) for traj in range(n_trajectories)]
+
+        # The tracks are set up according to the plan (colored tracks are
+        # allocated in full right away)
+        self._planHistory()
         self._track = [[] for traj in range(n_trajectories)]
         self._setupTracks(n_trajectories)
+        return n_frames
 
-        # TODO: Setting blit to True causes the initialization function to be
-        # called twice instead of just one time, strange. Setting it to false,
-        # however, stops all plotting.
-        anim = animation.FuncAnimation(self._figure, self._nextAnimationFrame, np.arange(0, n_frames), \
-                init_func=self._initAnimationFrame, interval=self._ANIMATION_INTERVAL, blit=True, \
-                repeat=False)
+    def setColorChannel(self, channel, cmap='viridis'):
+        """
+        setColorChannel(self, channel, cmap)
+        Color the lines by a derived channel of the trajectories (for example,
+        speed) instead of using a single color per trajectory.
 
-        pl.show()
+        :channel: One of COLOR_CHANNELS (None to go back to plain lines)
+        :cmap: Name of the colormap to use
+        """
+
+        if (channel is not None) and (channel not in self.COLOR_CHANNELS):
+            raise ValueError('Invalid color channel: %s, expected one of %s!'% \
+                    (channel, ', '.join(self.COLOR_CHANNELS)))
+
+        if (channel is not None) and self._is_3d:
+            raise ValueError('Lines can only be colored by a channel on 2D axes!')
+
+        self._color_channel = channel
+        self._color_cmap    = cmap
+
+    def _getColorNorm(self, values):
+        """
+        Color scale shared by all the colored lines in this container, widened
+        to include values
+        """
+
+        finite_values = np.asarray(values)[np.isfinite(values)]
+        if self._color_norm is None:
+            self._color_norm = colors.Normalize()
+        if len(finite_values) == 0:
+            return self._color_norm
+
+        v_min, v_max = finite_values.min(), finite_values.max()
+        if self._color_norm.vmin is not None:
+            v_min = min(v_min, self._color_norm.vmin)
+            v_max = max(v_max, self._color_norm.vmax)
+        self._color_norm.vmin, self._color_norm.vmax = v_min, v_max
+        return self._color_norm
+
+    def _getColoredLine(self, x_vals, y_vals, values, **collection_opts):
+        """
+        Build a single collection holding the segments between consecutive
+        samples, each colored by the value at its first sample
+        """
+
+        points   = np.column_stack((x_vals, y_vals))
+        segments = np.stack((points[:-1], points[1:]), axis=1)
+
+        # Masked values (used for the parts not shown yet) are transparent
+        cmap = pl.get_cmap(self._color_cmap).with_extremes(bad=(0.0, 0.0, 0.0, 0.0))
+        line = collections.LineCollection(segments, cmap=cmap, \
+                norm=self._getColorNorm(values), linewidths=self._line_width, **collection_opts)
+        line.set_array(np.asarray(values)[:-1])
+        self._axes.add_collection(line)
+        return line
+
+    def setMemoryBudget(self, n_bytes, policy=None):
+        """
+        setMemoryBudget(self, n_bytes, policy)
+        Limit the memory used by animations in this container. If showing the
+        entire history of the trajectories would not fit in the budget, the
+        playback is degraded according to policy instead.
+
+        :n_bytes: Memory budget in bytes (None to remove the budget)
+        :policy: HISTORY_DECIMATE (default) thins out the history that is
+            shown, HISTORY_WINDOW only shows a trail of the most recent points
+        """
+
+        if policy is None:
+            policy = GraphicsContainer.HISTORY_DECIMATE
+        if policy not in (GraphicsContainer.HISTORY_DECIMATE, GraphicsContainer.HISTORY_WINDOW):
+            raise ValueError('Invalid history policy: %s for memory budget!'% policy)
+
+        self._memory_budget = n_bytes
+        self._budget_policy = policy
+
+    def _historyLength(self, n_pts):
+        """
+        Number of points shown by the track of a trajectory with n_pts samples
+        at the end of the animation
+        """
+
+        return n_pts
+
+    def _getBufferBytes(self):
+        """
+        Memory used by the trajectory data being animated. Arrays shared by
+        several trajectories (commonly the time points) are counted once.
+        """
+
+        buffers = {}
+        for data in self._tpts + [dim_data for anim_data in self._anim_data for dim_data in anim_data] \
+                + (self._color_data or []):
+            buffers[id(data)] = np.asarray(data).nbytes
+        return sum(buffers.values())
+
+    def _planHistory(self):
+        """
+        _planHistory(self)
+        Work out how much of the history can be shown without going over the
+        memory budget (see setMemoryBudget)
+        """
+
+        self._history_stride = 1
+        self._trail_window   = None
+        if (self._memory_budget is None) or (len(self._tpts) == 0):
+            return
+
+        bytes_per_point = self.BYTES_PER_HISTORY_POINT
+        if self._color_data is not None:
+            bytes_per_point = self.BYTES_PER_COLORED_POINT
+
+        history_lengths = [self._historyLength(len(tpts)) for tpts in self._tpts]
+        needed_bytes    = sum(history_lengths) * bytes_per_point
+        available_bytes = self._memory_budget - self._getBufferBytes()
+        if needed_bytes <= available_bytes:
+            return
+
+        # If even the trajectory data doesn't fit, degrade as far as we can
+        available_bytes = max(available_bytes, 0)
+        if self._budget_policy == GraphicsContainer.HISTORY_DECIMATE:
+            if self._color_data is None:
+                # A decimated history is no longer a view (the latest point
+                # gets appended to it), so it is held once by us and once by
+                # the artist
+                needed_bytes = 2 * needed_bytes
+            self._history_stride = max(history_lengths)
+            if available_bytes > 0:
+                self._history_stride = min(self._history_stride, \
+                        int(np.ceil(needed_bytes / available_bytes)))
+        else:
+            points_per_track = available_bytes // (len(history_lengths) * bytes_per_point)
+            self._trail_window = int(max(2, points_per_track))
+
+    def getMemoryReport(self):
+        """
+        getMemoryReport(self)
+        Report the memory (in bytes) used by the animation in this container.
+
+        :returns: Dictionary with the memory used by the trajectory buffers,
+            the animation state (history of the animated tracks), the artists,
+            their total, along with the memory budget and the current history
+            stride and trail window.
+        """
+
+        state_bytes = 0
+        for past_data in self._past_data:
+            state_bytes += sum(_ownedBytes(dim_data) for dim_data in past_data)
+
+        buffer_bytes = self._getBufferBytes()
+        artist_bytes = sum(_artistBytes(track) for track in self._track)
+        return {'trajectory_buffers': buffer_bytes,
+                'animation_state': state_bytes,
+                'artists': artist_bytes,
+                'total': buffer_bytes + state_bytes + artist_bytes,
+                'budget': self._memory_budget,
+                'history_stride': self._history_stride,
+                'trail_window': self._trail_window}
+
+    def renderFrames(self, tr_obj):
+        """
+        renderFrames(self, tr_obj)
+        Render the animation of tr_obj offscreen, one frame at a time, without
+        going through the animation timer (Useful for exporting animations).
+
+        :tr_obj: Trajectory or TrajectorySet to be animated
+        :returns: Generator of RGBA images (numpy arrays of shape (height,
+            width, 4)), one for every animation frame
+        """
+
+        n_frames = self._setupAnimation(tr_obj)
+
+        # Animated artists are skipped by a regular draw
+        for line in self._track:
+            line.set_animated(False)
+
+        self._prepareAxes()
+        self._applyLayout()
+        self._initAnimationFrame()
+        for step in range(n_frames):
+            self._nextAnimationFrame(step)
+            self._figure.canvas.draw()
+            yield np.array(self._figure.canvas.buffer_rgba())
 
     def show(self):
         """
@@ -190,10 +826,7 @@ class GraphicsContainer(object):
         pl.figure(self._figure.number)
 
         # Set up labels
-        self._axes.set_xlabel(self._x_label)
-        self._axes.set_ylabel(self._y_label)
-        if (self._is_3d):
-            self._axes.set_zlabel(self._z_label)
+        self._prepareAxes()
 
         # Set up the line widths and fonts for axes labels
         for line in self._track:
@@ -204,12 +837,58 @@ class GraphicsContainer(object):
         # pl.show(self._axes)
         self._axes.set_xticks((0, 2, 4, 6))
         self._axes.set_yticks((0, 2, 4, 6))
-        pl.tight_layout()
+        self._applyLayout()
         pl.show()
 
     def getFigureWindow(self):
         return self._figure
 
+    def getPixelShape(self):
+        """
+        getPixelShape(self)
+        :returns: Size of the drawing area of the axes (in pixels) as (width,
+            height). Used to rasterize data at the figure resolution
+        """
+
+        # The labels have to be in place before the layout is worked out, it
+        # is not recomputed afterwards (see _applyLayout)
+        self._prepareAxes()
+        self._applyLayout()
+        axes_box = self._axes.get_position()
+        fig_w, fig_h = self._figure.get_size_inches() * self._figure.dpi
+        return max(1, int(round(axes_box.width * fig_w))), \
+                max(1, int(round(axes_box.height * fig_h)))
+
+    def showDensity(self, counts, extent, log_scale=False, cmap='magma'):
+        """
+        showDensity(self, counts, extent, log_scale)
+        Draw a 2D histogram as a single image in the axes
+
+        :counts: Histogram of shape (n_x, n_y) (see DensityAccumulator)
+        :extent: (x_min, x_max, y_min, y_max) covered by the histogram
+        :log_scale: Use a logarithmic color scale, empty bins are left blank
+        :returns: The image artist
+        """
+
+        if self._is_3d:
+            raise ValueError('Density images can only be drawn on 2D axes!')
+
+        image_data = counts.T
+        norm = None
+        if log_scale:
+            image_data = np.ma.masked_less_equal(image_data, 0)
+            if image_data.count() > 0:
+                norm = colors.LogNorm(vmin=image_data.min(), vmax=image_data.max())
+
+        image = self._axes.imshow(image_data, extent=extent, origin='lower', \
+                aspect='auto', interpolation='nearest', cmap=cmap, norm=norm)
+        self._axes.set_xlim(extent[0], extent[1])
+        self._axes.set_ylim(extent[2], extent[3])
+
+        self._prepareAxes()
+        self._applyLayout()
+        return image
+
 class LineContainer(GraphicsContainer):
     """
     Derived from GraphicsContainer for specifically animating Line or line-like
@@ -218,8 +897,8 @@ class LineContainer(GraphicsContainer):
 
     """
 
-    def __init__(self, axes_projection=None):
-        GraphicsContainer.__init__(self, axes_projection)
+    def __init__(self, axes_projection=None, figure=None, axes=None):
+        GraphicsContainer.__init__(self, axes_projection, figure, axes)
 
     def _setupTracks(self, n_trajectories):
         """TODO: Docstring for _setupTracks.
@@ -227,10 +906,14 @@ class LineContainer(GraphicsContainer):
 
         """
 
+        if self._color_data is not None:
+            self._setupColoredTracks(n_trajectories)
+            return
+
         # Choosing colors for different trajectories
         colors = colormap.magma(np.linspace(0, 1, n_trajectories))
         for traj in range(n_trajectories):
-            self._track[traj],    = pl.plot([], [], animated=True, c=colors[traj])
+            self._track[traj],    = self._axes.plot([], [], animated=True, c=colors[traj])
 
     def _nextAnimationFrame(self, step=0):
         """
@@ -244,18 +927,24 @@ class LineContainer(GraphicsContainer):
             frame
         """
 
-        # print("Setting up next frame")
-        next_time_val_for_frame = self._tpts[0][step]
-        # print("Searching for time point:", next_time_val_for_frame)
-
         for idx, anim_data in enumerate(self._anim_data):
             # This loop enumerates each trajectory
             # Now within each trajectory, we need to enumerate each dimension
-            idx_step = np.searchsorted(self._tpts[idx], next_time_val_for_frame)
+            idx_step = self._getFrameIndex(idx, step)
             # print("Time point: ", self._tpts[idx][idx_step], "found at index:", idx_step)
+
+            # The history is a view into the trajectory data, so we don't make
+            # a copy of the whole trajectory as the animation goes on
+            history_start = 0
+            if self._trail_window is not None:
+                history_start = max(0, idx_step - self._trail_window)
             for dim, dim_data in enumerate(anim_data):
-                for frame_index in range(self._t_elapsed[idx], idx_step):
-                    self._past_data[idx][dim].append(dim_data[frame_index])
+                history = dim_data[history_start:idx_step:self._history_stride]
+                if (self._history_stride > 1) and (idx_step > history_start) and \
+                        ((idx_step - 1 - history_start) % self._history_stride):
+                    # Always show the latest point
+                    history = np.append(history, dim_data[idx_step-1])
+                self._past_data[idx][dim] = history
             self._t_elapsed[idx] = idx_step
 
         self._update()
@@ -275,9 +964,98 @@ class LineContainer(GraphicsContainer):
         # as we already have in the current plot.
         # assert(len(self._track) == len(plt_args))
 
+        if self._color_data is not None:
+            self._updateColoredTracks()
+            return
+
         for idx, line in enumerate(self._track):
             line.set_data(*self._past_data[idx])
 
+    def _setupColoredTracks(self, n_trajectories):
+        """
+        _setupColoredTracks(self, n_trajectories)
+        Set up one collection per trajectory, holding all of its segments
+        (between every history_stride-th sample). As the animation goes on,
+        only the colors are updated (in bulk): segments which are not due yet
+        are masked out. With a trail window, the collection only ever holds
+        the segments in the window, which are replaced on every frame.
+        """
+
+        self._color_values = []
+        self._color_points = []
+        for traj in range(n_trajectories):
+            x_vals, y_vals = self._anim_data[traj][0], self._anim_data[traj][1]
+            color_data     = self._color_data[traj]
+            if self._trail_window is not None:
+                self._getColorNorm(color_data)
+                self._track[traj] = self._getColoredLine(x_vals[:1], y_vals[:1], \
+                        color_data[:1], animated=True)
+                self._color_values.append(None)
+                self._color_points.append(None)
+                continue
+
+            # Samples making up the track, always including the last one
+            points = np.arange(0, len(x_vals), self._history_stride)
+            if len(x_vals) and (points[-1] != len(x_vals) - 1):
+                points = np.append(points, len(x_vals) - 1)
+            self._track[traj] = self._getColoredLine(x_vals[points], y_vals[points], \
+                    np.asarray(color_data)[points], animated=True)
+            values = np.ma.masked_array(self._track[traj].get_array(), mask=True)
+            self._track[traj].set_array(values)
+            self._color_values.append(values)
+            self._color_points.append(points)
+
+    def _updateColoredTracks(self):
+        """
+        Reveal the segments that have elapsed (within the trail window, if
+        the memory budget requires one)
+        """
+
+        for idx, line in enumerate(self._track):
+            idx_step = self._t_elapsed[idx]
+            if self._trail_window is not None:
+                history_start = max(0, idx_step - 1 - self._trail_window)
+                points = np.column_stack((self._anim_data[idx][0][history_start:idx_step], \
+                        self._anim_data[idx][1][history_start:idx_step]))
+                line.set_segments(np.stack((points[:-1], points[1:]), axis=1))
+                line.set_array(np.asarray(self._color_data[idx][history_start:max(history_start, idx_step-1)]))
+                continue
+
+            # Segments between the samples that have elapsed
+            n_points   = np.searchsorted(self._color_points[idx], idx_step - 1, side='right')
+            n_segments = max(0, n_points - 1)
+            mask = np.ma.getmaskarray(self._color_values[idx])
+            mask[:] = True
+            mask[:n_segments] = False
+            self._color_values[idx].mask = mask
+            line.set_array(self._color_values[idx])
+
+    def plotColored(self, values, *plt_args):
+        """
+        plotColored(self, values, *plt_args)
+        Plot a line whose color varies along its length according to values
+        (drawn as a single collection). All the colored lines in a container
+        share the same color scale.
+
+        :values: Value at every sample, for coloring
+        :*plt_args: X and Y sample values
+        :returns: Nothing, the _track member of the class is updated with the
+            collection that was plotted
+        """
+
+        if self._is_3d:
+            raise ValueError('Lines can only be colored by a channel on 2D axes!')
+
+        if (np.ndim(values) != 1) or (len(values) != len(plt_args[0])):
+            raise ValueError('Invalid color values, expected a single value for each of the %d samples!'% \
+                    len(plt_args[0]))
+
+        self._track.append(self._getColoredLine(plt_args[0], plt_args[1], values))
+        self._axes.autoscale_view()
+        self._prepareAxes()
+        self._applyLayout()
+        return
+
     def plot(self, *plt_args):
         """
         plot(self, *plt_args)
@@ -292,9 +1070,182 @@ class LineContainer(GraphicsContainer):
         for tr in new_trajectories:
             self._track.append(tr)
 
-        cleanAxes(self._axes)
+        self._prepareAxes()
+        self._applyLayout()
         return
 
+    def extendPlot(self, key, *plt_args, show_start_stop=True):
+        """
+        extendPlot(self, key, *plt_args, show_start_stop)
+        Plot a growing trajectory, drawing only the samples that have been
+        added since the last call for the same key. Each trajectory keeps a
+        single line, which is handed the grown arrays. Whenever the new
+        samples fit in the current view, only they are drawn (as a temporary
+        segment blitted on top of the saved background); otherwise the axes
+        are rescaled and the figure is redrawn.
+
+        :key: Object identifying the trajectory (usually the trajectory itself)
+        :*plt_args: All the samples of the trajectory so far (X, Y). A single
+            array is plotted against the sample index, like axes.plot does.
+        :show_start_stop: Show markers for the first and the latest sample
+        :returns: Nothing, the plot is updated in place
+        """
+
+        if len(plt_args) == 1:
+            plt_args = (np.arange(len(plt_args[0])), plt_args[0])
+
+        n_samples = len(plt_args[0])
+        state = self._increments.get(key)
+        if state is None:
+            if self._draw_cid is None:
+                self._draw_cid = self._figure.canvas.mpl_connect('draw_event', self._onDraw)
+
+            line, = self._axes.plot(*plt_args)
+            self._track.append(line)
+            # Only ever drawn by blitting, the line itself covers these samples
+            # on a full redraw
+            segment, = self._axes.plot([], [], color=line.get_color(), \
+                    linewidth=line.get_linewidth(), animated=True)
+            state = {'n_drawn': n_samples, 'line': line, 'segment': segment, \
+                    'show_start_stop': show_start_stop, 'end_marker': None}
+            self._increments[key] = state
+            self._addStartStop(state, plt_args)
+            self._prepareAxes()
+            self._applyLayout()
+            self._redrawAxes()
+            return
+
+        if n_samples <= state['n_drawn']:
+            return
+
+        # Overlap by one sample so that the line stays connected
+        new_samples = [data[max(0, state['n_drawn']-1):] for data in plt_args]
+        if self._is_3d:
+            state['line'].set_data_3d(*plt_args)
+        else:
+            state['line'].set_data(*plt_args)
+        state['n_drawn'] = n_samples
+
+        if state['end_marker'] is not None:
+            if self._is_3d:
+                state['end_marker'].set_data_3d(*[data[-1:] for data in new_samples])
+            else:
+                state['end_marker'].set_data(*[data[-1:] for data in new_samples])
+        elif self._addStartStop(state, plt_args):
+            # The start marker is not part of the saved background yet
+            self._background = None
+
+        if self._isInView(new_samples):
+            state['segment'].set_data(*new_samples)
+            self._blitAxes(state['segment'])
+        else:
+            self._rescaleAxes()
+            self._redrawAxes()
+
+    def _addStartStop(self, state, plt_args):
+        """
+        Add markers for the first and the latest sample of an incrementally
+        drawn trajectory (if required and not done already)
+
+        :returns: True if the markers were added
+        """
+
+        if (not state['show_start_stop']) or (state['end_marker'] is not None) \
+                or (len(plt_args[0]) == 0):
+            return False
+
+        self._axes.plot(*[data[:1] for data in plt_args], 'bo')
+        # The end marker moves, so it is left out of the background and drawn
+        # on top of every full redraw (see _onDraw) or blit instead
+        state['end_marker'], = self._axes.plot(*[data[-1:] for data in plt_args], \
+                'rs', animated=True)
+        return True
+
+    def _onDraw(self, event):
+        """
+        Callback for every full draw of the figure (including the ones
+        triggered by show, resizing or panning). Saves the axes background for
+        incremental updates and draws the end markers, which are animated and
+        hence skipped by the draw itself.
+        """
+
+        if not self._increments:
+            return
+
+        canvas = self._figure.canvas
+        if canvas.is_saving() or not canvas.supports_blit:
+            # Saved figures are drawn with their own renderer (and resolution)
+            self._background = None
+        else:
+            self._background = canvas.copy_from_bbox(self._axes.bbox)
+            self._view_limits = (self._axes.get_xlim(), self._axes.get_ylim())
+
+        for marker in self._getEndMarkers():
+            marker.draw(event.renderer)
+
+    # Extra room left on each side when the axes have to be rescaled for a
+    # growing trajectory, so that we don't have to rescale on every refresh
+    _EXTEND_HEADROOM = 0.1
+
+    def _isInView(self, samples):
+        """
+        Check if the samples fall within the current axes limits
+        """
+
+        if self._is_3d or (self._background is None) or (len(samples) < 2):
+            return False
+
+        # Limits at the time the background was drawn. Querying the axes
+        # would autoscale them to include the new samples already.
+        (x_min, x_max), (y_min, y_max) = self._view_limits
+        x_vals, y_vals = np.asarray(samples[0]), np.asarray(samples[1])
+        return bool(np.all((x_vals >= min(x_min, x_max)) & (x_vals <= max(x_min, x_max)) & \
+                (y_vals >= min(y_min, y_max)) & (y_vals <= max(y_min, y_max))))
+
+    def _rescaleAxes(self):
+        """
+        Fit the axes limits to the data, leaving some headroom for growth
+        """
+
+        self._axes.relim()
+        self._axes.autoscale_view()
+        if self._is_3d or not self._axes.get_autoscale_on():
+            return
+
+        for get_lim, set_lim in ((self._axes.get_xlim, self._axes.set_xlim), \
+                (self._axes.get_ylim, self._axes.set_ylim)):
+            lim_min, lim_max = get_lim()
+            headroom = self._EXTEND_HEADROOM * (lim_max - lim_min)
+            set_lim(lim_min - headroom, lim_max + headroom, auto=None)
+
+    def _getEndMarkers(self):
+        return [state['end_marker'] for state in self._increments.values() \
+                if state['end_marker'] is not None]
+
+    def _redrawAxes(self):
+        """
+        Draw the whole figure. The axes background (without the end markers)
+        is saved for subsequent incremental updates by _onDraw.
+        """
+
+        canvas = self._figure.canvas
+        canvas.draw()
+        canvas.flush_events()
+
+    def _blitAxes(self, segment):
+        """
+        Draw a new segment on top of the saved background and blit the axes
+        """
+
+        canvas = self._figure.canvas
+        canvas.restore_region(self._background)
+        self._axes.draw_artist(segment)
+        self._background = canvas.copy_from_bbox(self._axes.bbox)
+        for marker in self._getEndMarkers():
+            self._axes.draw_artist(marker)
+        canvas.blit(self._axes.bbox)
+        canvas.flush_events()
+
 class PointContainer(LineContainer):
     """
     Derived from LineContainer. This object shows the movement of an object
@@ -302,8 +1253,11 @@ class PointContainer(LineContainer):
 
     """
 
-    def __init__(self, axes_projection=None):
-        LineContainer.__init__(self, axes_projection)
+    def __init__(self, axes_projection=None, figure=None, axes=None):
+        LineContainer.__init__(self, axes_projection, figure, axes)
+
+    def _historyLength(self, n_pts):
+        return 1
 
     def _setupTracks(self, n_trajectories):
         """TODO: Docstring for _setupTracks.
@@ -311,7 +1265,7 @@ class PointContainer(LineContainer):
 
         """
         for traj in range(n_trajectories):
-            self._track[traj],    = pl.plot([], [], animated=True, marker='o')
+            self._track[traj],    = self._axes.plot([], [], animated=True, marker='o')
 
     def _nextAnimationFrame(self, step=0):
         """
@@ -325,19 +1279,335 @@ class PointContainer(LineContainer):
             frame
         """
 
-        # print("Setting up next frame")
-        next_time_val_for_frame = self._tpts[0][step]
-        # print("Searching for time point:", next_time_val_for_frame)
-
         for idx, anim_data in enumerate(self._anim_data):
             # This loop enumerates each trajectory
             # Now within each trajectory, we need to enumerate each dimension
-            idx_step = np.searchsorted(self._tpts[idx], next_time_val_for_frame)
+            idx_step = self._getFrameIndex(idx, step)
             # print("Time point: ", self._tpts[idx][idx_step], "found at index:", idx_step)
-            for dim, dim_data in enumerate(anim_data):
-                for frame_index in range(self._t_elapsed[idx], idx_step):
-                    self._past_data[idx][dim] = dim_data[frame_index]
+            if idx_step > self._t_elapsed[idx]:
+                # Only the latest position is shown (kept as a length-1 slice
+                # since lines do not accept scalar data)
+                for dim, dim_data in enumerate(anim_data):
+                    self._past_data[idx][dim] = dim_data[idx_step-1:idx_step]
             self._t_elapsed[idx] = idx_step
 
         self._update()
         return self._track
+
+class ContainerPool(object):
+    """
+    A bounded pool of graphics containers. Creating a container sets up a new
+    figure and axes, which dominates the cost of drawing lots of small plots.
+    Containers handed back to the pool are cleared and reused instead.
+
+    Up to max_figures containers (and hence figure windows) are kept alive.
+    If the pool is full, the least recently released container is closed to
+    make room. Containers that are still checked out are never closed: if all
+    of them are in use, the pool grows past max_figures and shrinks back as
+    they are released.
+    """
+
+    def __init__(self, max_figures=8, headless=False):
+        """
+        Class constructor
+        :max_figures: Maximum number of live figures held by the pool
+        :headless: Draw the figures of the pool with Agg, without ever
+            creating windows for them, regardless of the pyplot backend (for
+            saving plots to files)
+        """
+
+        if max_figures < 1:
+            raise ValueError('Container pool needs room for at least one figure!')
+
+        self._max_figures   = max_figures
+        self._headless      = headless
+
+        # Containers in the order in which they were last acquired (least
+        # recent first) and the subset of those which are free to be reused
+        self._containers    = []
+        self._idle          = []
+
+    def acquire(self, container_class, axes_projection=None):
+        """
+        acquire(self, container_class, axes_projection)
+        Get a (cleared) container of the requested kind, creating one only if
+        no idle container of this kind is available
+
+        :container_class: LineContainer, PointContainer, etc.
+        :axes_projection: Axes projection, as for the container constructor
+        :returns: Container that is checked out until release is called
+        """
+
+        for container in self._idle:
+            if (type(container) is container_class) and \
+                    (container._is_3d == (axes_projection == '3d')):
+                self._idle.remove(container)
+                self._containers.remove(container)
+                self._containers.append(container)
+                container.reset()
+                return container
+
+        while self._idle and (len(self._containers) >= self._max_figures):
+            self._evict()
+
+        if self._headless:
+            figure = _newHeadlessFigure(container_class.FIGURE_SIZE)
+            container = container_class(axes_projection, figure, \
+                    figure.add_subplot(projection=axes_projection))
+        else:
+            container = container_class(axes_projection)
+        container._pool = self
+        self._containers.append(container)
+        return container
+
+    def release(self, container):
+        """
+        release(self, container)
+        Mark a container as being free for reuse
+
+        :container: A container previously obtained from acquire
+        """
+
+        if (container in self._containers) and (container not in self._idle):
+            self._idle.append(container)
+
+        # Shrink back to the bound if the pool had to grow while all of its
+        # containers were checked out
+        while self._idle and (len(self._containers) > self._max_figures):
+            self._evict()
+
+    def clear(self):
+        """
+        clear(self)
+        Close all the figures held by the pool
+        """
+
+        while self._containers:
+            self._evict(self._containers[0])
+
+    def getNFigures(self):
+        return(len(self._containers))
+
+    def _evict(self, victim=None):
+        """
+        Close a container, by default the least recently released idle one
+        """
+
+        if victim is None:
+            victim = self._idle[0]
+        if victim in self._idle:
+            self._idle.remove(victim)
+        self._containers.remove(victim)
+        victim._pool = None
+        victim.close()
+
+class GridContainer(object):
+    """
+    A grid of graphics containers in a single figure (small multiples). All
+    the containers are animated together: they share one clock (the union of
+    the reference time points of all the cells) and a single table of frame
+    indices. A single timer drives the grid, and every tick redraws the
+    moving lines of all the cells and blits the whole figure at once.
+    """
+
+    def __init__(self, n_rows, n_cols, container_class=None, axes_projection=None):
+        """
+        Class constructor
+        :n_rows: Number of rows in the grid
+        :n_cols: Number of columns in the grid
+        :container_class: Class of the containers in the cells (LineContainer
+            by default)
+        :axes_projection: Axes projection for all the cells ('3d' or None)
+        """
+
+        if container_class is None:
+            container_class = LineContainer
+
+        self._figure    = pl.figure(figsize=(4*n_cols, 4*n_rows))
+        self._cells     = []
+        for cell_idx in range(n_rows * n_cols):
+            axes = self._figure.add_subplot(n_rows, n_cols, 1+cell_idx, projection=axes_projection)
+            self._cells.append(container_class(axes_projection, self._figure, axes))
+
+        self._ANIMATION_INTERVAL = 25   # Frame rate for animation
+        self._playback_clock     = None
+
+        # Timer, frame sequence and saved background for blitting
+        self._timer         = None
+        self._frames        = None
+        self._background    = None
+        self._draw_cid      = None
+
+        # Shared clock and frame index table (all the trajectories of all the
+        # cells, stacked, by the frames)
+        self._clock         = None
+        self._frame_table   = None
+        self._active_cells  = []
+
+    def getCell(self, cell_idx):
+        return self._cells[cell_idx]
+
+    def getNCells(self):
+        return(len(self._cells))
+
+    def getFigureWindow(self):
+        return self._figure
+
+    def _setupAnimation(self, tr_objs):
+        """
+        _setupAnimation(self, tr_objs)
+        Set up every cell for animating its trajectory and build the shared
+        clock and the frame index table
+
+        :returns: The number of frames in the animation
+        """
+
+        if len(tr_objs) > len(self._cells):
+            raise ValueError('%d trajectories do not fit in a grid of %d cells!'% (len(tr_objs), len(self._cells)))
+
+        self._active_cells = self._cells[:len(tr_objs)]
+        for cell, tr_obj in zip(self._active_cells, tr_objs):
+            cell._setupAnimation(tr_obj)
+        for cell in self._cells[len(tr_objs):]:
+            cell._axes.set_visible(False)
+
+        self._clock = np.unique(np.concatenate([cell._tpts[0] for cell in self._active_cells]))
+
+        # Unaligned time points make the clock long, so the indices are kept
+        # in the smallest integer type that can hold them
+        n_rows = sum(len(cell._tpts) for cell in self._active_cells)
+        max_index = max(len(tpts) for cell in self._active_cells for tpts in cell._tpts)
+        self._frame_table = np.empty((n_rows, len(self._clock)), dtype=np.min_scalar_type(max_index))
+        row = 0
+        for cell in self._active_cells:
+            for tpts in cell._tpts:
+                self._frame_table[row] = np.searchsorted(tpts, self._clock)
+                row += 1
+            # Each cell gets a view of its own rows
+            cell._frame_table = self._frame_table[row-len(cell._tpts):row]
+
+        return len(self._clock)
+
+    def _initAnimationFrame(self):
+        tracks = []
+        for cell in self._active_cells:
+            cell._initAnimationFrame()
+            tracks.extend(cell._track)
+        return tracks
+
+    def _nextAnimationFrame(self, step=0):
+        tracks = []
+        for cell in self._active_cells:
+            cell._nextAnimationFrame(step)
+            tracks.extend(cell._track)
+        return tracks
+
+    def _prepareCells(self):
+        for cell in self._active_cells:
+            cell._prepareAxes()
+        self._figure.tight_layout()
+
+    def animate(self, tr_objs, realtime=False, speed=1.0):
+        """
+        animate(self, tr_objs, realtime, speed)
+        Animate several trajectories (or trajectory sets) side by side, one
+        per cell, in sync and on a single timer
+
+        :tr_objs: List of Trajectory/TrajectorySet objects, filling the grid
+            row by row
+        :realtime: If True, playback follows the wall clock (see
+            GraphicsContainer.animate)
+        :speed: Simulated time per second of wall time, for realtime playback
+        """
+
+        self._setupAnimation(tr_objs)
+        self._prepareCells()
+        frames, self._playback_clock = _getAnimationFrames(self._clock, realtime, speed)
+        self._frames = iter(frames)
+        self._initAnimationFrame()
+
+        # The timer is started once the figure has been drawn (see _onDraw)
+        canvas = self._figure.canvas
+        if self._timer is not None:
+            self._timer.stop()
+        self._timer = canvas.new_timer(interval=self._ANIMATION_INTERVAL)
+        self._timer.add_callback(self._tick)
+        self._background = None
+        if self._draw_cid is None:
+            self._draw_cid = canvas.mpl_connect('draw_event', self._onDraw)
+
+        pl.show()
+
+    def _onDraw(self, event):
+        """
+        Callback for every full draw of the figure. Saves the background (the
+        moving lines are animated, so they are not part of it) and starts the
+        animation timer after the first draw.
+        """
+
+        canvas = self._figure.canvas
+        if canvas.is_saving() or not canvas.supports_blit:
+            self._background = None
+            return
+
+        self._background = canvas.copy_from_bbox(self._figure.bbox)
+        if self._frames is not None:
+            self._drawTracks()
+            if self._timer is not None:
+                self._timer.start()
+
+    def _drawTracks(self):
+        for cell in self._active_cells:
+            for line in cell._track:
+                cell._axes.draw_artist(line)
+
+    def _tick(self):
+        """
+        Advance all the cells to the next frame and blit the whole figure
+        """
+
+        if self._background is None:
+            return
+
+        step = next(self._frames, None)
+        if step is None:
+            self._frames = None
+            self._timer.stop()
+            return
+
+        canvas = self._figure.canvas
+        canvas.restore_region(self._background)
+        self._nextAnimationFrame(step)
+        self._drawTracks()
+        canvas.blit(self._figure.bbox)
+
+    def getPlaybackStats(self):
+        """
+        getPlaybackStats(self)
+        :returns: Statistics of the last realtime animation of the grid, or
+            None if it wasn't played in realtime
+        """
+
+        if self._playback_clock is None:
+            return None
+        return self._playback_clock.getStats()
+
+    def renderFrames(self, tr_objs):
+        """
+        renderFrames(self, tr_objs)
+        Render the grid animation offscreen, one frame at a time
+
+        :returns: Generator of RGBA images, one for every animation frame
+        """
+
+        n_frames = self._setupAnimation(tr_objs)
+        for cell in self._active_cells:
+            for line in cell._track:
+                line.set_animated(False)
+
+        self._prepareCells()
+        self._initAnimationFrame()
+        for step in range(n_frames):
+            self._nextAnimationFrame(step)
+            self._figure.canvas.draw()
+            yield np.array(self._figure.canvas.buffer_rgba())
@@ -0,0 +1,174 @@
+"""
+This file implements integration of batches of differential equation systems.
+All the initial conditions are stepped together over numpy arrays and the
+solutions are written straight into a TrajectorySet.
+"""
+
+import concurrent.futures
+import numpy as np
+from MotionAnimation.PY import data_types as mtype
+
+METHOD_RK4  = 'rk4'
+METHOD_RK45 = 'rk45'
+
+# Dormand-Prince coefficients for the adaptive RK45 method
+_DP_C = np.array([0.0, 1.0/5.0, 3.0/10.0, 4.0/5.0, 8.0/9.0, 1.0, 1.0])
+_DP_A = [[],
+        [1.0/5.0],
+        [3.0/40.0, 9.0/40.0],
+        [44.0/45.0, -56.0/15.0, 32.0/9.0],
+        [19372.0/6561.0, -25360.0/2187.0, 64448.0/6561.0, -212.0/729.0],
+        [9017.0/3168.0, -355.0/33.0, 46732.0/5247.0, 49.0/176.0, -5103.0/18656.0],
+        [35.0/384.0, 0.0, 500.0/1113.0, 125.0/192.0, -2187.0/6784.0, 11.0/84.0]]
+_DP_B = np.array(_DP_A[6] + [0.0])
+_DP_E = _DP_B - np.array([5179.0/57600.0, 0.0, 7571.0/16695.0, 393.0/640.0, \
+        -92097.0/339200.0, 187.0/2100.0, 1.0/40.0])
+
+# Limits on the step size adaptation
+_SAFETY     = 0.9
+_MIN_FACTOR = 0.2
+_MAX_FACTOR = 5.0
+
+def _stepRK4(rhs, t, y, h):
+    """
+    Single classical Runge-Kutta step for the whole batch
+    """
+
+    k1 = rhs(t, y)
+    k2 = rhs(t + 0.5 * h, y + 0.5 * h * k1)
+    k3 = rhs(t + 0.5 * h, y + 0.5 * h * k2)
+    k4 = rhs(t + h, y + h * k3)
+    return y + (h / 6.0) * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+
+def _stepRK45(rhs, t, y, h, k1):
+    """
+    Single Dormand-Prince step for the whole batch
+
+    :returns: The new state, the error estimate and the derivative at the new
+        state (which is the first stage of the next step)
+    """
+
+    k = [k1]
+    for stage in range(1, 7):
+        y_stage = y + h * sum(a * k_prev for a, k_prev in zip(_DP_A[stage], k) if a != 0.0)
+        k.append(rhs(t + _DP_C[stage] * h, y_stage))
+
+    # The last stage is evaluated at the 5th order solution
+    y_new = y_stage
+    error = h * sum(e * k_stage for e, k_stage in zip(_DP_E, k) if e != 0.0)
+    return y_new, error, k[6]
+
+def _integrateBatch(rhs, y0, t_eval, method, n_substeps, rtol, atol, max_steps):
+    """
+    _integrateBatch(rhs, y0, t_eval, method, n_substeps, rtol, atol, max_steps)
+    Integrate a batch of initial conditions, recording the state at t_eval
+
+    :returns: Array of shape (n_initial_conditions, n_dims, n_pts)
+    """
+
+    n_batch, n_dims = y0.shape
+    solution = np.empty((n_batch, n_dims, len(t_eval)))
+    solution[:, :, 0] = y0
+
+    y = y0.copy()
+    if method == METHOD_RK4:
+        for t_idx in range(1, len(t_eval)):
+            h = (t_eval[t_idx] - t_eval[t_idx-1]) / n_substeps
+            t = t_eval[t_idx-1]
+            for substep in range(n_substeps):
+                y = _stepRK4(rhs, t + substep * h, y, h)
+            solution[:, :, t_idx] = y
+        return solution
+
+    # Adaptive step. A single step size is shared by the whole batch and it is
+    # dictated by the initial condition with the largest error.
+    t  = t_eval[0]
+    h  = (t_eval[-1] - t_eval[0]) / (len(t_eval) - 1) / n_substeps
+    k1 = rhs(t, y)
+    n_steps = 0
+    for t_idx in range(1, len(t_eval)):
+        t_target = t_eval[t_idx]
+        while t < t_target:
+            n_steps += 1
+            if n_steps > max_steps:
+                raise RuntimeError('Integration did not finish in %d steps!'% max_steps)
+
+            # Don't step past the next output point
+            h_step = min(h, t_target - t)
+            y_new, error, k_new = _stepRK45(rhs, t, y, h_step, k1)
+
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+            error_norm = np.max(np.sqrt(np.mean((error / scale)**2, axis=1)))
+            if error_norm <= 1.0:
+                t, y, k1 = t + h_step, y_new, k_new
+                if h_step < h:
+                    # Clipped step, the step size is still good
+                    continue
+
+            if error_norm == 0.0:
+                factor = _MAX_FACTOR
+            else:
+                factor = min(_MAX_FACTOR, max(_MIN_FACTOR, _SAFETY * error_norm**-0.2))
+            h = h_step * factor
+
+        solution[:, :, t_idx] = y
+    return solution
+
+def integrate(rhs, y0, t_span, n_pts=100, method=METHOD_RK4, n_substeps=1, \
+        rtol=1e-6, atol=1e-9, max_steps=1000000, n_workers=None):
+    """
+    integrate(rhs, y0, t_span, n_pts, method, n_substeps, rtol, atol, n_workers)
+    Integrate the system dy/dt = rhs(t, y) for a whole batch of initial
+    conditions at once.
+
+    :rhs: Vectorized right hand side. Called as rhs(t, y) with y of shape
+        (n_initial_conditions, n_dims), it should return the derivatives with
+        the same shape. Must be picklable (a module level function) if
+        n_workers is used.
+    :y0: Initial conditions of shape (n_initial_conditions, n_dims), or
+        (n_dims,) for a single one. n_dims can be 1, 2 or 3.
+    :t_span: (t_start, t_stop) Interval of integration
+    :n_pts: Number of (evenly spaced) time points at which the solution is
+        recorded
+    :method: METHOD_RK4 for fixed steps or METHOD_RK45 for adaptive steps
+    :n_substeps: RK4 steps taken between output points (for RK4), or
+        initial number of steps between output points (for RK45)
+    :rtol: Relative tolerance for RK45
+    :atol: Absolute tolerance for RK45
+    :max_steps: Maximum number of RK45 steps (per worker)
+    :n_workers: Number of processes to split the initial conditions over.
+        By default, everything is integrated in this process.
+    :returns: TrajectorySet with one trajectory per initial condition (see
+        getColumnarSet)
+    """
+
+    if method not in (METHOD_RK4, METHOD_RK45):
+        raise ValueError('Invalid integration method: %s!'% method)
+
+    y0 = np.atleast_2d(np.asarray(y0, dtype=float))
+    if y0.ndim != 2:
+        raise ValueError('Expected initial conditions of shape (n_initial_conditions, n_dims)!')
+
+    # Fail early if the dimensions can't be visualized
+    mtype.getTRClass(y0.shape[1])
+
+    if t_span[1] <= t_span[0]:
+        raise ValueError('Expected t_span to be an increasing interval!')
+    if n_pts < 2:
+        raise ValueError('Need at least 2 time points for a trajectory!')
+
+    t_eval = np.linspace(t_span[0], t_span[1], n_pts)
+    solver_args = (t_eval, method, n_substeps, rtol, atol, max_steps)
+
+    if (n_workers is None) or (n_workers <= 1) or (len(y0) < 2):
+        solution = _integrateBatch(rhs, y0, t_eval, method, n_substeps, rtol, atol, max_steps)
+    else:
+        solution = np.empty((y0.shape[0], y0.shape[1], n_pts))
+        shards = np.array_split(np.arange(len(y0)), min(n_workers, len(y0)))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            shard_solutions = executor.map(_integrateBatch, [rhs] * len(shards), \
+                    [y0[shard] for shard in shards], *[[arg] * len(shards) for arg in solver_args])
+            for shard, shard_solution in zip(shards, shard_solutions):
+                solution[shard] = shard_solution
+
+    return mtype.getColumnarSet(t_eval, solution)
@@ -0,0 +1,326 @@
+"""
+This file implements loaders for reading trajectories from CSV, NPY and NPZ
+files. Data is streamed straight into preallocated trajectory buffers, so the
+peak memory stays close to the size of the final trajectories.
+"""
+
+import io
+import time
+import numpy as np
+from MotionAnimation.PY import data_types as mtype
+
+# Size of the blocks in which CSV files are read and parsed
+CSV_CHUNK_BYTES = 4 * 1024 * 1024
+
+# Number of rows copied at a time from NPY files
+NPY_CHUNK_ROWS  = 1024 * 1024
+
+def _resolveColumns(n_columns, column_names, columns, id_column):
+    """
+    _resolveColumns(n_columns, column_names, columns, id_column)
+    Map the requested columns (names or indices) to column indices.
+
+    :n_columns: Number of columns available in the source
+    :column_names: Names of the available columns (None if not known)
+    :columns: Sequence of columns, time first, followed by 1-3 data columns.
+        By default, all columns (except the id column) are used in order.
+    :id_column: Column holding the trajectory id (or None)
+    :returns: List of column indices (time, data..., id) and the number of
+        data dimensions
+    """
+
+    def _index(column):
+        if isinstance(column, str):
+            if (column_names is None) or (column not in column_names):
+                raise ValueError('Column %s not found in input!'% column)
+            return column_names.index(column)
+        if (column < -n_columns) or (column >= n_columns):
+            raise ValueError('Column index %d out of range for input with %d columns!'% (column, n_columns))
+        return column % n_columns
+
+    id_index = None if id_column is None else _index(id_column)
+    if columns is None:
+        column_indices = [idx for idx in range(n_columns) if idx != id_index]
+    else:
+        column_indices = [_index(column) for column in columns]
+
+    n_dims = len(column_indices) - 1
+    if n_dims < 1:
+        raise ValueError('Need a time column and at least one data column to build a trajectory!')
+
+    # Fail early if the dimensions can't be visualized
+    mtype.getTRClass(n_dims)
+
+    if id_index is not None:
+        column_indices.append(id_index)
+    return column_indices, n_dims
+
+def _buildTrajectories(data, n_dims, has_ids):
+    """
+    _buildTrajectories(data, n_dims, has_ids)
+    Wrap the loaded columns into trajectories. The trajectories hold views
+    into data, no copies are made (unless the rows have to be grouped).
+
+    :data: Array of shape (n_columns, n_rows) with rows time, data..., id
+    :n_dims: Number of data dimensions
+    :has_ids: If True, the last row holds the trajectory ids, which are used
+        to split the data into a TrajectorySet
+    :returns: Trajectory, or TrajectorySet if has_ids is True
+    """
+
+    tr_class = mtype.getTRClass(n_dims)
+    if not has_ids:
+        return tr_class(*data[:n_dims+1])
+
+    ids = data[-1]
+    if np.any(ids[1:] < ids[:-1]):
+        # Rows of a trajectory are not contiguous, a (stable) sort keeps
+        # them in their original order within each trajectory. The columns
+        # are reordered one at a time, so only a single column is copied.
+        order = np.argsort(ids, kind='stable')
+        for row in data:
+            row[:] = row[order]
+        del order
+
+    boundaries = np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1, [len(ids)]))
+    tr_set = mtype.TrajectorySet()
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        tr_set.append(tr_class(*data[:n_dims+1, start:stop]))
+    return tr_set
+
+def _parseRows(text, delimiter):
+    """
+    _parseRows(text, delimiter)
+    Parse lines of delimited numbers, skipping blank lines
+
+    :returns: Array of shape (n_rows, n_columns)
+    """
+
+    return np.loadtxt(io.StringIO(text), delimiter=delimiter.strip() or None, ndmin=2)
+
+def _fillReport(report, n_rows, n_trajectories, t_start):
+    """
+    Record throughput statistics in report (if supplied)
+    """
+
+    if report is None:
+        return
+
+    elapsed_time = time.perf_counter() - t_start
+    report['rows']              = n_rows
+    report['trajectories']      = n_trajectories
+    report['seconds']           = elapsed_time
+    report['rows_per_second']   = (n_rows / elapsed_time) if elapsed_time > 0 else float('inf')
+
+def loadCSV(file_name, columns=None, id_column=None, delimiter=',', header=True, report=None):
+    """
+    loadCSV(file_name, columns, id_column, delimiter, header, report)
+    Load trajectories from a CSV file containing one sample per row. The file
+    is parsed in blocks of CSV_CHUNK_BYTES with numpy, straight into the
+    trajectory buffers.
+
+    :file_name: Path to the CSV file
+    :columns: Columns (names or indices), time first followed by 1-3 data
+        columns. All columns other than the id column are used by default.
+    :id_column: Column (name or index) holding trajectory ids. If supplied,
+        rows are grouped by id into a TrajectorySet.
+    :delimiter: Field separator. Use ' ' for any whitespace.
+    :header: Whether the first line holds the column names
+    :report: Optional dictionary which is filled with the number of rows,
+        trajectories, time taken and rows per second
+    :returns: Trajectory, or TrajectorySet if id_column is given
+    """
+
+    t_start = time.perf_counter()
+
+    # Count the rows first so that the buffers can be allocated in one go
+    n_lines = 0
+    last_byte = b'\n'
+    with open(file_name, 'rb') as csv_file:
+        for block in iter(lambda: csv_file.read(CSV_CHUNK_BYTES), b''):
+            n_lines += block.count(b'\n')
+            last_byte = block[-1:]
+    if last_byte != b'\n':
+        n_lines += 1
+
+    with open(file_name, 'r') as csv_file:
+        column_names = None
+        if header:
+            column_names = [name.strip() for name in csv_file.readline().split(delimiter.strip() or None)]
+            n_columns = len(column_names)
+            n_lines -= 1
+        else:
+            first_line = csv_file.readline()
+            while first_line and not first_line.strip():
+                first_line = csv_file.readline()
+            if not first_line:
+                raise ValueError('No data found in %s!'% file_name)
+            n_columns = _parseRows(first_line, delimiter).shape[1]
+            csv_file.seek(0)
+
+        column_indices, n_dims = _resolveColumns(n_columns, column_names, columns, id_column)
+
+        data = np.empty((len(column_indices), max(n_lines, 0)))
+        n_rows = 0
+        while True:
+            block = csv_file.read(CSV_CHUNK_BYTES)
+            if not block:
+                break
+            # Complete the last line in the block
+            block += csv_file.readline()
+            if not block.strip():
+                continue
+
+            values = _parseRows(block, delimiter)
+            if values.shape[1] != n_columns:
+                raise ValueError('Rows in %s do not all have %d columns!'% (file_name, n_columns))
+
+            data[:, n_rows:n_rows+len(values)] = values[:, column_indices].T
+            n_rows += len(values)
+
+    # Blank lines are counted above but skipped by the parser
+    data = data[:, :n_rows]
+
+    tr_obj = _buildTrajectories(data, n_dims, id_column is not None)
+    _fillReport(report, n_rows, tr_obj.getNTrajectories(), t_start)
+    return tr_obj
+
+def loadNPY(file_name, columns=None, id_column=None, report=None):
+    """
+    loadNPY(file_name, columns, id_column, report)
+    Load trajectories from a NPY file holding a 2D array with one sample per
+    row (or a 1D structured array with named fields). The file is memory
+    mapped and copied into the trajectory buffers NPY_CHUNK_ROWS at a time.
+
+    :file_name: Path to the NPY file
+    :columns: Columns (field names or indices), time first followed by 1-3
+        data columns. All columns other than the id column are used by default.
+    :id_column: Column holding trajectory ids. If supplied, rows are grouped
+        by id into a TrajectorySet.
+    :report: Optional dictionary which is filled with the number of rows,
+        trajectories, time taken and rows per second
+    :returns: Trajectory, or TrajectorySet if id_column is given
+    """
+
+    t_start = time.perf_counter()
+    source = np.load(file_name, mmap_mode='r')
+
+    column_names = None
+    if source.dtype.names is not None:
+        column_names = list(source.dtype.names)
+        n_columns = len(column_names)
+    elif source.ndim == 2:
+        n_columns = source.shape[1]
+    else:
+        raise ValueError('Expected a 2D array or a structured array in %s!'% file_name)
+
+    column_indices, n_dims = _resolveColumns(n_columns, column_names, columns, id_column)
+    n_rows = len(source)
+
+    data = np.empty((len(column_indices), n_rows))
+    for start in range(0, n_rows, NPY_CHUNK_ROWS):
+        stop = min(start + NPY_CHUNK_ROWS, n_rows)
+        for row, column in enumerate(column_indices):
+            if column_names is None:
+                data[row, start:stop] = source[start:stop, column]
+            else:
+                data[row, start:stop] = source[column_names[column]][start:stop]
+
+    del source
+    tr_obj = _buildTrajectories(data, n_dims, id_column is not None)
+    _fillReport(report, n_rows, tr_obj.getNTrajectories(), t_start)
+    return tr_obj
+
+def _readArrayColumns(npy_file, file_name, columns, id_column):
+    """
+    _readArrayColumns(npy_file, file_name, columns, id_column)
+    Copy the requested columns of a 2D array stored in NPY format (e.g. a
+    member of a NPZ archive) into a new buffer, reading the file in chunks
+
+    :npy_file: File object positioned at the start of the NPY data
+    :returns: Array of shape (n_columns, n_rows) with rows time, data..., id
+        and the number of data dimensions
+    """
+
+    version = np.lib.format.read_magic(npy_file)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npy_file)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npy_file)
+    else:
+        raise ValueError('Unsupported NPY format version %d.%d in %s!'% (version + (file_name,)))
+    if (len(shape) != 2) or dtype.hasobject or (dtype.names is not None):
+        raise ValueError('Expected a 2D numeric array in %s!'% file_name)
+
+    n_rows, n_columns = shape
+    column_indices, n_dims = _resolveColumns(n_columns, None, columns, id_column)
+    data = np.empty((len(column_indices), n_rows))
+
+    def _readValues(n_values):
+        n_bytes = n_values * dtype.itemsize
+        block = npy_file.read(n_bytes)
+        if len(block) != n_bytes:
+            raise ValueError('Unexpected end of data in %s!'% file_name)
+        return np.frombuffer(block, dtype=dtype)
+
+    if fortran_order:
+        # Columns are stored one after the other
+        for column in range(n_columns):
+            targets = [row for row, index in enumerate(column_indices) if index == column]
+            for start in range(0, n_rows, NPY_CHUNK_ROWS):
+                stop = min(start + NPY_CHUNK_ROWS, n_rows)
+                values = _readValues(stop - start)
+                for row in targets:
+                    data[row, start:stop] = values
+    else:
+        for start in range(0, n_rows, NPY_CHUNK_ROWS):
+            stop = min(start + NPY_CHUNK_ROWS, n_rows)
+            values = _readValues((stop - start) * n_columns).reshape(-1, n_columns)
+            data[:, start:stop] = values[:, column_indices].T
+
+    return data, n_dims
+
+def loadNPZ(file_name, columns=None, id_column=None, report=None):
+    """
+    loadNPZ(file_name, columns, id_column, report)
+    Load trajectories from a NPZ file. The archive can either hold one 1D
+    array per column (columns are then referred to by their keys), or a single
+    2D array with one sample per row. Columns are copied into the trajectory
+    buffers one at a time, or NPY_CHUNK_ROWS rows at a time from a single
+    array, so unused columns are never held in memory as a whole.
+
+    :file_name: Path to the NPZ file
+    :columns: Columns (keys or indices), time first followed by 1-3 data
+        columns. All columns other than the id column are used by default.
+    :id_column: Column holding trajectory ids. If supplied, rows are grouped
+        by id into a TrajectorySet.
+    :report: Optional dictionary which is filled with the number of rows,
+        trajectories, time taken and rows per second
+    :returns: Trajectory, or TrajectorySet if id_column is given
+    """
+
+    t_start = time.perf_counter()
+    with np.load(file_name) as archive:
+        column_names = list(archive.files)
+        if len(column_names) == 1:
+            # Single 2D array, each column is one variable
+            with archive.zip.open(column_names[0] + '.npy') as member:
+                data, n_dims = _readArrayColumns(member, file_name, columns, id_column)
+            n_rows = data.shape[1]
+        else:
+            column_indices, n_dims = _resolveColumns(len(column_names), column_names, columns, id_column)
+            n_rows = None
+            for row, column in enumerate(column_indices):
+                # Arrays are read from the archive one column at a time
+                column_data = archive[column_names[column]]
+                if n_rows is None:
+                    n_rows = len(column_data)
+                    data = np.empty((len(column_indices), n_rows))
+                elif len(column_data) != n_rows:
+                    raise ValueError('Columns in %s do not all have the same length!'% file_name)
+                data[row] = column_data
+                del column_data
+
+    tr_obj = _buildTrajectories(data, n_dims, id_column is not None)
+    _fillReport(report, n_rows, tr_obj.getNTrajectories(), t_start)
+    return tr_obj
@@ -0,0 +1,234 @@
+"""
+This file implements trajectory sets that are stored in shared memory, so that
+they can be handed to worker processes without copying the data
+"""
+
+import sys
+import threading
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from MotionAnimation.PY import data_types as mtype
+
+# Serializes attaching on Python < 3.13, see _openSegment
+_ATTACH_LOCK = threading.Lock()
+
+def _openSegment(name):
+    """
+    Attach to an existing shared memory segment without handing it over to
+    the resource tracker (which would otherwise unlink it when this process
+    exits, even though we don't own it)
+    """
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    # Python < 3.13 has no track argument and registers every segment it
+    # opens. A process that is not a child of the owner has its own resource
+    # tracker, which would unlink the owner's segment when the process exits.
+    # Unregistering after the fact is not an option either: children share
+    # the owner's tracker, and it would then lose track of the owner's own
+    # registration. So registration is skipped while attaching.
+    with _ATTACH_LOCK:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+class SharedTrajectorySet(mtype.TrajectorySet):
+    """
+    A TrajectorySet whose data lives in a single shared memory segment.
+
+    The process that creates the set from a Trajectory/TrajectorySet owns the
+    segment and unlinks it on close. Other processes attach to it using the
+    handle (see getHandle and attachTrajectorySet), or simply by receiving the
+    set through pickling (e.g. as an argument to a process pool), which only
+    sends the handle. Attached sets are zero-copy numpy views into the segment
+    and only close their own mapping.
+
+    Layout of the segment (all 8 byte values):
+        - offsets (n_trajectories + 1, int64): start of each trajectory
+        - time points (n_samples,)
+        - sample values (n_dims, n_samples)
+    """
+
+    def __init__(self, tr_obj=None, handle=None):
+        """
+        Class constructor
+        :tr_obj: Trajectory or TrajectorySet to copy into a new shared segment
+            (the set then owns the segment)
+        :handle: Handle of an existing segment to attach to (see getHandle)
+        """
+
+        super(SharedTrajectorySet, self).__init__()
+        self._root = None
+
+        if (tr_obj is None) == (handle is None):
+            raise ValueError('Supply exactly one of tr_obj or handle for a shared trajectory set!')
+
+        if handle is None:
+            self._is_owner = True
+            handle = self._createSegment(tr_obj)
+        else:
+            self._is_owner = False
+            self._segment = _openSegment(handle['name'])
+
+        self._handle = handle
+        self._mapViews()
+
+    def _createSegment(self, tr_obj):
+        """
+        Allocate the segment and copy the trajectory data into it
+
+        :returns: Handle for the new segment
+        """
+
+        n_trajectories = tr_obj.getNTrajectories()
+        if n_trajectories == 0:
+            raise ValueError('Can not share an empty trajectory set!')
+
+        n_dims = len(tr_obj.getSampleValues(0))
+        lengths = np.zeros(n_trajectories, dtype=np.int64)
+        for traj in range(n_trajectories):
+            if len(tr_obj.getSampleValues(traj)) != n_dims:
+                raise ValueError('All trajectories in a shared set need the same number of dimensions!')
+            lengths[traj] = len(tr_obj.getTPts(traj))
+
+        n_samples = int(lengths.sum())
+        n_values  = (n_trajectories + 1) + n_samples * (1 + n_dims)
+        self._segment = shared_memory.SharedMemory(create=True, size=max(8, 8 * n_values))
+
+        handle = {'name': self._segment.name,
+                'n_trajectories': n_trajectories,
+                'n_dims': n_dims,
+                'n_samples': n_samples}
+        offsets, t_vals, values = self._getBlocks(handle)
+
+        offsets[0] = 0
+        np.cumsum(lengths, out=offsets[1:])
+        for traj in range(n_trajectories):
+            start, stop = offsets[traj], offsets[traj+1]
+            t_vals[start:stop] = tr_obj.getTPts(traj)
+            for dim, dim_data in enumerate(tr_obj.getSampleValues(traj)):
+                values[dim, start:stop] = dim_data
+
+        return handle
+
+    def _getBlocks(self, handle):
+        """
+        Numpy views of the offsets, time points and sample values stored in
+        the segment
+        """
+
+        n_offsets = handle['n_trajectories'] + 1
+        n_samples = handle['n_samples']
+        n_dims    = handle['n_dims']
+
+        # All the views are derived from a single root array, so we can tell
+        # whether any of them is still alive before unmapping the segment
+        if self._root is None:
+            self._root = np.frombuffer(self._segment.buf, dtype=np.uint8)
+
+        offsets_end = 8 * n_offsets
+        t_vals_end  = offsets_end + 8 * n_samples
+        values_end  = t_vals_end + 8 * n_dims * n_samples
+        offsets = self._root[:offsets_end].view(np.int64)
+        t_vals  = self._root[offsets_end:t_vals_end].view(np.float64)
+        values  = self._root[t_vals_end:values_end].view(np.float64).reshape(n_dims, n_samples)
+        return offsets, t_vals, values
+
+    def _mapViews(self):
+        """
+        Set up the trajectories in the set as views into the segment
+        """
+
+        offsets, t_vals, values = self._getBlocks(self._handle)
+        tr_class = mtype.getTRClass(self._handle['n_dims'])
+
+        self._tr_set = []
+        for traj in range(self._handle['n_trajectories']):
+            start, stop = offsets[traj], offsets[traj+1]
+            tr = tr_class(t_vals[start:stop], *values[:, start:stop])
+            trajectory_axis_identifier = tr.getAxisIdentifier()
+            if trajectory_axis_identifier is not None:
+                self._AXES_IDENTIFIER = trajectory_axis_identifier
+            self._tr_set.append(tr)
+
+    def append(self, tr):
+        raise Exception("Shared trajectory sets can not be extended. Share a new set instead.")
+
+    def getHandle(self):
+        """
+        getHandle(self)
+        :returns: A small, picklable description of the shared segment, which
+            can be passed to attachTrajectorySet in another process
+        """
+
+        return dict(self._handle)
+
+    def isOwner(self):
+        return(self._is_owner)
+
+    def close(self):
+        """
+        close(self)
+        Release this process' mapping of the segment. The owner also unlinks
+        (frees) the segment, after which no new process can attach to it.
+        All references to the trajectories of the set (and to arrays taken
+        from them) have to be dropped before calling close, otherwise a
+        BufferError is raised and the set stays usable.
+        """
+
+        if self._segment is None:
+            return
+
+        self._tr_set = []
+        if sys.getrefcount(self._root) > 2:
+            # Someone still holds a view into the segment (the two references
+            # are our own and the one passed to getrefcount)
+            self._mapViews()
+            raise BufferError('Views into the shared trajectory set are still in use, drop them before closing!')
+
+        self._root = None
+        self._segment.close()
+        if self._is_owner:
+            self._segment.unlink()
+        self._segment = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __reduce__(self):
+        # Only the handle is sent to other processes, which attach to the
+        # segment instead of receiving a copy of the data
+        return (attachTrajectorySet, (self.getHandle(),))
+
+def shareTrajectorySet(tr_obj):
+    """
+    shareTrajectorySet(tr_obj)
+    Copy a Trajectory or TrajectorySet into shared memory
+
+    :tr_obj: Trajectory or TrajectorySet (all members need the same number of
+        dimensions)
+    :returns: SharedTrajectorySet owning the shared segment
+    """
+
+    return SharedTrajectorySet(tr_obj=tr_obj)
+
+def attachTrajectorySet(handle):
+    """
+    attachTrajectorySet(handle)
+    Attach to a trajectory set shared by another process
+
+    :handle: Handle obtained from SharedTrajectorySet.getHandle
+    :returns: SharedTrajectorySet (not owning the segment) whose trajectories
+        are views into the shared memory
+    """
+
+    return SharedTrajectorySet(handle=handle)
@@ -0,0 +1,21 @@
+from MotionAnimation.PY import graphics as grp
+from MotionAnimation.PY import data_types as mtype
+import numpy as np
+
+n_trajectories  = 20
+n_pts           = 5000
+tpts            = np.linspace(0.0, 1.0, n_pts)
+
+tr_set  = mtype.TrajectorySet()
+for tr_idx in range(n_trajectories):
+    phase   = 2.0 * np.pi * tr_idx / n_trajectories
+    xvals   = tpts * np.cos(20.0 * np.pi * tpts + phase)
+    yvals   = tpts * np.sin(20.0 * np.pi * tpts + phase)
+    tr_set.append(mtype.Trajectory__2D(tpts, xvals, yvals))
+
+# Showing the full history would need ~1.6MB for the lines alone. Limit the
+# animation to 2MB in total and show a trail instead.
+figure_handle = grp.LineContainer()
+figure_handle.setMemoryBudget(2 * 1024 * 1024, grp.GraphicsContainer.HISTORY_WINDOW)
+tr_set.plotTimedTR(figure_handle=figure_handle)
+print(figure_handle.getMemoryReport())
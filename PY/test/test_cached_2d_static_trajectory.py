@@ -0,0 +1,34 @@
+from MotionAnimation.PY import cache as mcache
+from MotionAnimation.PY import data_types as mtype
+import matplotlib.pylab as pl
+import numpy as np
+import tempfile
+
+n_pts   = 100
+tpts    = np.linspace(0.0, 1.0, n_pts)
+xvals   = pow(tpts, 2) * np.sin(np.pi * tpts)
+yvals   = -2.0 * tpts * np.cos(np.pi * tpts)
+xy_tr   = mtype.Trajectory__2D(tpts, xvals, yvals)
+
+with tempfile.TemporaryDirectory() as cache_dir:
+    render_cache = mcache.RenderCache(cache_dir)
+
+    # The second call should be served from the cache
+    image_path  = render_cache.renderStatic(xy_tr)
+    image_path  = render_cache.renderStatic(xy_tr)
+
+    # Changing the trajectory should trigger a new render
+    xy_tr.update(1.1, 0.5, 2.0)
+    image_path  = render_cache.renderStatic(xy_tr)
+
+    # Animation frames can be cached too
+    frames      = render_cache.renderFrames(xy_tr)
+    frames      = render_cache.renderFrames(xy_tr)
+    print("Rendered", frames.shape[0], "frames. Cache stats:", render_cache.getStats())
+
+    image = pl.imread(image_path)
+
+pl.figure()
+pl.imshow(image)
+pl.axis('off')
+pl.show()
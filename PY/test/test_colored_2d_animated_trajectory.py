@@ -0,0 +1,20 @@
+from MotionAnimation.PY import graphics as grp
+from MotionAnimation.PY import data_types as mtype
+import numpy as np
+
+n_pts   = 200
+tpts    = np.linspace(0.0, 1.0, n_pts)
+xvals   = pow(tpts, 2) * np.sin(4.0 * np.pi * tpts)
+yvals   = -2.0 * tpts * np.cos(4.0 * np.pi * tpts)
+xy_tr   = mtype.Trajectory__2D(tpts, xvals, yvals)
+
+# Derived channels are computed once and cached
+print("Path length:", xy_tr.getArcLength()[-1], "Top speed:", np.max(xy_tr.getSpeed()))
+
+# Static plot colored by speed
+xy_tr.plotStaticTR(color_by='speed')
+
+# Animation colored by speed
+figure_handle = grp.LineContainer()
+figure_handle.setColorChannel('speed')
+xy_tr.plotTimedTR(figure_handle=figure_handle)
@@ -0,0 +1,31 @@
+from MotionAnimation.PY import export as mexport
+from MotionAnimation.PY import data_types as mtype
+import matplotlib.pylab as pl
+import numpy as np
+import tempfile
+import os
+
+def showProgress(n_done, n_total):
+    if (n_done % 10 == 0) or (n_done == n_total):
+        print("Exported", n_done, "of", n_total, "plots")
+
+if __name__ == '__main__':
+    n_plots = 40
+    n_pts   = 100
+    tpts    = np.linspace(0.0, 1.0, n_pts)
+
+    tr_objs = []
+    for plot_idx in range(n_plots):
+        xvals   = pow(tpts, 2) * np.sin(np.pi * (1 + plot_idx) * tpts)
+        yvals   = -2.0 * tpts * np.cos(np.pi * tpts)
+        tr_objs.append(mtype.Trajectory__2D(tpts, xvals, yvals))
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        out_paths = [os.path.join(out_dir, 'trajectory_%03d.png'% plot_idx) for plot_idx in range(n_plots)]
+        mexport.exportStaticBatch(tr_objs, out_paths, n_workers=4, progress=showProgress)
+        image = pl.imread(out_paths[-1])
+
+    pl.figure()
+    pl.imshow(image)
+    pl.axis('off')
+    pl.show()
@@ -0,0 +1,15 @@
+from MotionAnimation.PY import data_types as mtype
+import numpy as np
+
+# Compare a few scenarios side by side. The scenarios don't even need to be
+# sampled at the same time points, they are synchronized on a common clock.
+tr_objs = []
+for scenario in range(4):
+    n_pts   = 100 + 50 * scenario
+    tpts    = np.linspace(0.0, 1.0, n_pts)
+    damping = 0.5 * scenario
+    xvals   = np.exp(-damping * tpts) * np.cos(4.0 * np.pi * tpts)
+    yvals   = np.exp(-damping * tpts) * np.sin(4.0 * np.pi * tpts)
+    tr_objs.append(mtype.Trajectory__2D(tpts, xvals, yvals))
+
+mtype.plotTimedGrid(tr_objs)
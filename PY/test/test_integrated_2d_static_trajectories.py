@@ -0,0 +1,17 @@
+from MotionAnimation.PY import integrate as mint
+import numpy as np
+
+def vanDerPol(t, y):
+    # Vectorized over the batch of initial conditions (one per row)
+    mu = 1.0
+    return np.column_stack((y[:, 1], mu * (1.0 - y[:, 0]**2) * y[:, 1] - y[:, 0]))
+
+# A grid of initial conditions, all integrated together
+n_per_side  = 5
+x0, y0      = np.meshgrid(np.linspace(-3.0, 3.0, n_per_side), np.linspace(-3.0, 3.0, n_per_side))
+initial_conditions = np.column_stack((x0.ravel(), y0.ravel()))
+
+tr_set = mint.integrate(vanDerPol, initial_conditions, (0.0, 10.0), n_pts=500, \
+        method=mint.METHOD_RK45)
+print("Integrated", tr_set.getNTrajectories(), "trajectories.")
+tr_set.plotStaticTR()
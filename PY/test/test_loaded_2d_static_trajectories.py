@@ -0,0 +1,39 @@
+from MotionAnimation.PY import loaders as mload
+import numpy as np
+import tempfile
+import os
+
+n_trajectories  = 5
+n_pts           = 1000
+tpts            = np.linspace(0.0, 1.0, n_pts)
+
+# Write out a CSV file with one sample per row: id, t, x, y
+rows = []
+for tr_idx in range(n_trajectories):
+    xvals   = pow(tpts, 2) * np.sin(np.pi * (1 + tr_idx) * tpts)
+    yvals   = -2.0 * tpts * np.cos(np.pi * tpts) + tr_idx
+    rows.append(np.column_stack((np.full(n_pts, tr_idx), tpts, xvals, yvals)))
+
+with tempfile.TemporaryDirectory() as data_dir:
+    csv_file    = os.path.join(data_dir, 'trajectories.csv')
+    npz_file    = os.path.join(data_dir, 'trajectories.npz')
+    all_rows    = np.vstack(rows)
+    np.savetxt(csv_file, all_rows, delimiter=',', header='id,t,x,y', comments='')
+    np.savez(npz_file, id=all_rows[:, 0], t=all_rows[:, 1], x=all_rows[:, 2], y=all_rows[:, 3])
+
+    load_report = {}
+    tr_set = mload.loadCSV(csv_file, columns=('t', 'x', 'y'), id_column='id', report=load_report)
+    print("Loaded", tr_set.getNTrajectories(), "trajectories from CSV at", \
+            int(load_report['rows_per_second']), "rows/s")
+
+    # Blank lines at the end of the file (CRLF or not) are skipped
+    with open(csv_file, 'a', newline='') as csv_handle:
+        csv_handle.write('\r\n\r\n\n')
+    tr_set = mload.loadCSV(csv_file, columns=('t', 'x', 'y'), id_column='id')
+    print("Loaded", tr_set.getNTrajectories(), "trajectories from CSV with trailing blank lines")
+
+    tr_set = mload.loadNPZ(npz_file, columns=('t', 'x', 'y'), id_column='id', report=load_report)
+    print("Loaded", tr_set.getNTrajectories(), "trajectories from NPZ at", \
+            int(load_report['rows_per_second']), "rows/s")
+
+tr_set.plotStaticTR()
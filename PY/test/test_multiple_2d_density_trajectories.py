@@ -0,0 +1,18 @@
+from MotionAnimation.PY import data_types as mtype
+import numpy as np
+
+# A large number of noisy trajectories (Monte-Carlo style)
+n_trajectories  = 10000
+n_pts           = 200
+tpts            = np.linspace(0.0, 1.0, n_pts)
+
+rng     = np.random.default_rng(0)
+tr_set  = mtype.TrajectorySet()
+for tr_idx in range(n_trajectories):
+    noise   = np.cumsum(rng.normal(scale=0.02, size=(2, n_pts)), axis=1)
+    xvals   = pow(tpts, 2) * np.sin(np.pi * tpts) + noise[0]
+    yvals   = -2.0 * tpts * np.cos(np.pi * tpts) + noise[1]
+    tr_set.append(mtype.Trajectory__2D(tpts, xvals, yvals))
+
+# Drawing 10k lines is slow and unreadable, draw the density instead
+tr_set.plotStaticTR(density=True, log_scale=True, segments=True)
@@ -0,0 +1,28 @@
+from MotionAnimation.PY import graphics as grp
+from MotionAnimation.PY import data_types as mtype
+import numpy as np
+import time
+
+n_pts   = 100
+n_plots = 50
+tpts    = np.linspace(0.0, 1.0, n_pts)
+
+# Draw all the plots from a pool holding a couple of figures instead of
+# creating a new figure window for each one of them
+pool    = grp.ContainerPool(max_figures=2)
+grp.setDefaultPool(pool)
+
+t_start = time.time()
+for plot_idx in range(n_plots):
+    xvals   = pow(tpts, 2) * np.sin(np.pi * (1 + plot_idx) * tpts)
+    yvals   = -2.0 * tpts * np.cos(np.pi * tpts)
+    xy_tr   = mtype.Trajectory__2D(tpts, xvals, yvals)
+
+    figure_handle = xy_tr.getContainer()
+    xy_tr.plotStaticTR(figure_handle=figure_handle, show=False)
+    figure_handle.release()
+
+print("Drew", n_plots, "plots in", time.time() - t_start, "s using", pool.getNFigures(), "figures.")
+
+grp.setDefaultPool(None)
+figure_handle.show()
@@ -0,0 +1,20 @@
+from MotionAnimation.PY import data_types as mtype
+from MotionAnimation.PY import graphics as grp
+import numpy as np
+
+n_trajectories  = 50
+n_pts           = 2000
+tpts            = np.linspace(0.0, 10.0, n_pts)
+
+tr_set  = mtype.TrajectorySet()
+for tr_idx in range(n_trajectories):
+    phase   = 2.0 * np.pi * tr_idx / n_trajectories
+    xvals   = np.exp(-0.1 * tpts) * np.cos(2.0 * tpts + phase)
+    yvals   = np.exp(-0.1 * tpts) * np.sin(3.0 * tpts + phase)
+    tr_set.append(mtype.Trajectory__2D(tpts, xvals, yvals))
+
+# 10s of simulated time played back in 5s, no matter how long each frame
+# takes to draw
+figure_handle = grp.LineContainer()
+tr_set.plotTimedTR(figure_handle=figure_handle, realtime=True, speed=2.0)
+print(figure_handle.getPlaybackStats())
@@ -0,0 +1,22 @@
+from MotionAnimation.PY import data_types as mtype
+import numpy as np
+import time
+
+n_refreshes     = 200
+n_pts_per_step  = 50
+dt              = 0.01
+
+# Start with a short trajectory and keep growing it, as a running simulation
+# would, refreshing the static view every time
+tpts    = np.arange(n_pts_per_step) * dt
+xy_tr   = mtype.Trajectory__2D(tpts, np.sin(tpts), np.cos(2.0 * tpts))
+figure_handle = xy_tr.refreshStaticTR()
+
+t_start = time.time()
+for step in range(1, n_refreshes):
+    new_tpts = (step * n_pts_per_step + np.arange(n_pts_per_step)) * dt
+    xy_tr.update(new_tpts, np.sin(new_tpts), np.cos(2.0 * new_tpts))
+    figure_handle = xy_tr.refreshStaticTR(figure_handle=figure_handle)
+
+print("Average refresh time:", (time.time() - t_start) / (n_refreshes - 1), "s")
+figure_handle.show()
@@ -0,0 +1,34 @@
+from MotionAnimation.PY import shared as mshared
+from MotionAnimation.PY import data_types as mtype
+import concurrent.futures
+import numpy as np
+
+def pathLength(tr_set, index):
+    # tr_set arrives in the worker as a handle and attaches to the shared
+    # memory, the trajectory data itself is never copied
+    xvals, yvals = tr_set.getSampleValues(index)
+    path_length = np.sum(np.hypot(np.diff(xvals), np.diff(yvals)))
+
+    # Views into the shared memory have to be dropped before detaching
+    del xvals, yvals
+    tr_set.close()
+    return path_length
+
+if __name__ == '__main__':
+    n_trajectories  = 8
+    n_pts           = 100000
+    tpts            = np.linspace(0.0, 1.0, n_pts)
+
+    tr_set = mtype.TrajectorySet()
+    for tr_idx in range(n_trajectories):
+        xvals   = pow(tpts, 2) * np.sin(np.pi * (1 + tr_idx) * tpts)
+        yvals   = -2.0 * tpts * np.cos(np.pi * tpts)
+        tr_set.append(mtype.Trajectory__2D(tpts, xvals, yvals))
+
+    with mshared.shareTrajectorySet(tr_set) as shared_set:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+            path_lengths = list(executor.map(pathLength, [shared_set] * n_trajectories, \
+                    range(n_trajectories)))
+        print("Path lengths:", np.round(path_lengths, 3))
+
+        shared_set.plotStaticTR()